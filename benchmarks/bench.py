@@ -0,0 +1,205 @@
+"""
+D4TAlink benchmarks
+
+Benchmark of the task lifecycle and of the task I/O methods.
+
+Usage:
+    python benchmarks/bench.py                  # quick sizes
+    python benchmarks/bench.py --full           # 100 to 100k tasks, 1 KB to 1 GB frames
+    python benchmarks/bench.py --root /mnt/nfs  # benchmark on another filesystem
+    python benchmarks/bench.py --compare benchmarks/results/old.json
+
+Each benchmark is run once for the wall time, and once more with the file
+operations counted and the memory traced, since tracing slows it down. The
+results are saved as JSON in benchmarks/results (see --output), and compared
+with a previous results file if --compare is given.
+
+The script is standalone rather than a pytest-benchmark or asv suite, since
+it counts file operations and traces memory, which these do not report, and
+runs without extra dependencies on any filesystem given by --root.
+
+Results file, '<label>.json':
+    label       str    label of the run (--label), by default its date and time
+    commit      str    short git commit of the benchmarked tree, "" outside git
+    python      str    Python version
+    platform    str    platform string
+    date        str    ISO 8601 date and time of the run
+    results     list   one object per benchmark and size:
+        benchmark     str    name, e.g. "loadTask" or "saveBinary"
+        size          int    number of tasks, or frame size in bytes
+        seconds       float  wall time of the first run
+        fileOps       int    file operations of the second run: opens,
+                             renames, removals, listings, links, copies,
+                             directory creations and stat calls
+        filesTouched  int    distinct paths of these operations
+        peakMB        float  peak memory traced by tracemalloc, in MB
+--compare matches the results by (benchmark, size) and only reads seconds, so
+that files with more or fewer fields can still be compared.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import itertools
+import platform
+import tempfile
+import tracemalloc
+import subprocess
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import d4talink as D4
+
+KB = 1024
+MB = 1024 * KB
+GB = 1024 * MB
+NCOLS = 10
+# Excel worksheets are limited to 1048576 rows.
+XLSX_MAX_BYTES = 64 * MB
+# File operations counted through audit events, and through wrappers for stat.
+_FILE_EVENTS = {"open", "os.mkdir", "os.rename", "os.replace", "os.remove",
+                "os.listdir", "os.scandir", "os.link", "shutil.copyfile"}
+_counter = {"active": False, "ops": 0, "files": set()}
+
+# -------------------------------------------------------------------------------
+def _audit(event,args):
+    if _counter["active"] and event in _FILE_EVENTS:
+        _counter["ops"] += 1
+        if args and isinstance(args[0], (str, bytes, os.PathLike)):
+            _counter["files"].add(os.fsdecode(args[0]))
+# -------------------------------------------------------------------------------
+def _counting(f):
+    def wrapper(path,*args,**kwargs):
+        if _counter["active"]:
+            _counter["ops"] += 1
+            if isinstance(path, (str, bytes, os.PathLike)):
+                _counter["files"].add(os.fsdecode(path))
+        return f(path,*args,**kwargs)
+    return wrapper
+# -------------------------------------------------------------------------------
+def measure(run,setup=None):
+    """Measure a benchmark: wall time, number of file operations, number of distinct files touched and peak traced memory."""
+    state = setup() if setup is not None else None
+    t0 = time.perf_counter()
+    run(state)
+    seconds = time.perf_counter() - t0
+    state = setup() if setup is not None else None
+    _counter.update(active=True, ops=0, files=set())
+    tracemalloc.start()
+    try:
+        run(state)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        _counter["active"] = False
+    return {"seconds": seconds, "fileOps": _counter["ops"],
+            "filesTouched": len(_counter["files"]), "peakMB": peak / MB}
+# -------------------------------------------------------------------------------
+def frame(nbytes):
+    """Create a DataFrame of about the given size, with float columns and a string column."""
+    rows = max(1, nbytes // (8 * NCOLS))
+    df = pd.DataFrame(np.random.default_rng(0).random((rows, NCOLS - 1)),
+                      columns=[f"x{i}" for i in range(NCOLS - 1)])
+    df["site"] = (np.arange(rows) % 300).astype(str)
+    return df
+# -------------------------------------------------------------------------------
+def benchTasks(n):
+    """Benchmarks of the task lifecycle for n tasks, and of n small outputs of one task with their manifest records."""
+    res = {}
+    names = [f"t{i:06d}" for i in range(n)]
+    packages = (f"package{i}" for i in itertools.count())
+    res["Task.__init__"] = measure(lambda pkg: [D4.Task("bench", pkg, t) for t in names],
+                                   setup=lambda: next(packages))
+    res["loadTask"] = measure(lambda s: [D4.loadTask("bench", "package0", t) for t in names])
+    res["loadTasks"] = measure(lambda s: D4.loadTasks([("bench", "package0", t) for t in names]))
+    task = D4.loadTask("bench", "package0", names[0])
+    res["getTaskFilepath"] = measure(
+        lambda s: [task.getTaskFilepath(f"f{i}", "pkl", "binary") for i in range(n)])
+    outputs = D4.Task("bench", "outputs", f"o{n}", overwrite=True)
+    res["saveBinary small"] = measure(lambda s: [outputs.saveBinary(i, f"s{i}") for i in range(n)])
+    res["verifyTask"] = measure(lambda s: D4.verifyTask(outputs))
+    return res
+# -------------------------------------------------------------------------------
+def benchFrames(nbytes):
+    """Benchmarks of the task I/O methods for a DataFrame of about nbytes bytes."""
+    res = {}
+    task = D4.Task("bench", "frames", f"f{nbytes}", overwrite=True)
+    df = frame(nbytes)
+    res["saveBinary"] = measure(lambda s: task.saveBinary(df, "df"))
+    res["readBinary"] = measure(lambda s: task.readBinary("df"))
+    res["saveReportCsv"] = measure(lambda s: task.saveReportCsv(df, "df"))
+    res["readReportCsv"] = measure(lambda s: task.readReportCsv("df"))
+    if nbytes <= XLSX_MAX_BYTES:
+        res["saveReportXls"] = measure(lambda s: task.saveReportXls(df, "df", quiet=True))
+        res["readReportXls"] = measure(lambda s: task.readReportXls("df"))
+    return res
+# -------------------------------------------------------------------------------
+def compare(results,old):
+    """Print the ratio of the wall times of two results."""
+    ref = {(r["benchmark"], r["size"]): r for r in old["results"]}
+    print(f"\n{'benchmark':<20}{'size':>12}{'old (s)':>12}{'new (s)':>12}{'ratio':>8}")
+    for r in results:
+        o = ref.get((r["benchmark"], r["size"]))
+        if o is not None:
+            print(f"{r['benchmark']:<20}{r['size']:>12}{o['seconds']:>12.4f}"
+                  f"{r['seconds']:>12.4f}{r['seconds'] / o['seconds']:>8.2f}")
+# -------------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="D4TAlink benchmarks")
+    parser.add_argument("--full", action="store_true", help="run the full sizes")
+    parser.add_argument("--tasks", type=int, nargs="*", help="numbers of tasks")
+    parser.add_argument("--sizes", type=int, nargs="*", help="frame sizes in bytes")
+    parser.add_argument("--root", default=None, help="directory of the task root")
+    parser.add_argument("--output", default=os.path.join(os.path.dirname(__file__), "results"))
+    parser.add_argument("--label", default=None, help="label of the results")
+    parser.add_argument("--compare", default=None, help="results file to compare with")
+    args = parser.parse_args()
+    ntasks = args.tasks or ([100, 1000, 10000, 100000] if args.full else [100, 1000])
+    sizes = args.sizes or ([KB, MB, 100 * MB, GB] if args.full else [KB, MB])
+
+    sys.addaudithook(_audit)
+    os.stat = _counting(os.stat)
+    os.lstat = _counting(os.lstat)
+    root = tempfile.mkdtemp(prefix="d4talink-bench-", dir=args.root)
+    D4.setTaskAuthor("bench")
+    D4.setTaskSponsor("bench")
+    results = []
+    try:
+        for n in ntasks:
+            D4.setTaskRoot(os.path.join(root, f"tasks{n}"), dirCreate=True)
+            for (k, v) in benchTasks(n).items():
+                results.append({"benchmark": k, "size": n, **v})
+                print(f"{k:<20}{n:>12} tasks {v['seconds']:10.4f}s {v['fileOps']:>9} ops "
+                      f"{v['peakMB']:9.1f} MB")
+        D4.setTaskRoot(os.path.join(root, "frames"), dirCreate=True)
+        for b in sizes:
+            for (k, v) in benchFrames(b).items():
+                results.append({"benchmark": k, "size": b, **v})
+                print(f"{k:<20}{b:>12} bytes {v['seconds']:10.4f}s {v['fileOps']:>9} ops "
+                      f"{v['peakMB']:9.1f} MB")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=os.path.dirname(__file__)).stdout.strip()
+    except OSError:
+        commit = ""
+    label = args.label or datetime.now().strftime("%Y%m%d-%H%M%S")
+    out = {"label": label, "commit": commit, "python": platform.python_version(),
+           "platform": platform.platform(), "date": datetime.now().isoformat(),
+           "results": results}
+    os.makedirs(args.output, exist_ok=True)
+    fn = os.path.join(args.output, f"{label}.json")
+    with open(fn, "w") as fp:
+        json.dump(out, fp, indent=1)
+    print(f"\nResults saved to '{fn}'")
+    if args.compare:
+        with open(args.compare) as fp:
+            compare(results, json.load(fp))
+# -------------------------------------------------------------------------------
+if __name__ == "__main__":
+    main()
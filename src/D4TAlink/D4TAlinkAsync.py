@@ -0,0 +1,51 @@
+"""
+D4TAlinkAsync
+
+D4TAlink executor for the asynchronous task methods.
+"""
+
+__all__ = ["setAsyncExecutor",
+           "getAsyncExecutor"]
+
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+_D4TAlinkExecutor = {"executor": None, "maxWorkers": 16}
+
+# -------------------------------------------------------------------------------
+def setAsyncExecutor(maxWorkers=16, executor=None):
+    """Set the executor running the blocking I/O of the asynchronous task methods. By default, a pool of threads is created with the given maximum number of workers, which bounds the number of task I/O operations running concurrently; the operations in excess wait in the queue of the pool. Another executor can also be given. The previous executor is shut down without waiting for its running operations.
+
+    Attributes:
+    maxWorkers (int): The maximum number of threads of the default executor.
+    executor (Executor): The executor to use instead of the default one (optional).
+
+    Returns:
+    Executor: The executor.
+    """
+    old = _D4TAlinkExecutor["executor"]
+    _D4TAlinkExecutor["maxWorkers"] = maxWorkers
+    _D4TAlinkExecutor["executor"] = executor
+    if old is not None and old is not executor:
+        old.shutdown(wait=False)
+    return getAsyncExecutor()
+# -------------------------------------------------------------------------------
+def getAsyncExecutor():
+    """Get the executor running the blocking I/O of the asynchronous task methods. The default pool of threads is created on first use.
+
+    Returns:
+    Executor: The executor.
+    """
+    if _D4TAlinkExecutor["executor"] is None:
+        _D4TAlinkExecutor["executor"] = ThreadPoolExecutor(
+            max_workers=_D4TAlinkExecutor["maxWorkers"],thread_name_prefix="D4TAlink")
+    return _D4TAlinkExecutor["executor"]
+# -------------------------------------------------------------------------------
+async def _runAsync(fn,*args,**kwargs):
+    """Run a blocking function on the executor and wait for its result. The function runs in a copy of the context of the coroutine, so that it sees the configuration set by config. If the waiting coroutine is cancelled before the function starts, the function is not run; once started, it runs to completion in the background."""
+    import asyncio
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(getAsyncExecutor(),functools.partial(ctx.run,fn,*args,**kwargs))
+# -------------------------------------------------------------------------------
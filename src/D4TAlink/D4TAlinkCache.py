@@ -0,0 +1,151 @@
+"""
+D4TAlinkCache
+
+D4TAlink result cache of the task computations.
+"""
+
+__all__ = ["pruneTaskCaches"]
+
+import os
+import json
+import glob
+import types
+import pickle
+import hashlib
+import threading
+import contextlib
+from datetime import datetime
+from .D4TAlinkPar import *
+from .D4TAlinkLock import fileLock, _atomicWrite
+
+# Subdirectory of the binary directory holding the cached results and their index.
+_CACHE_SUBDIR = "cache"
+# Lock serializing the updates of the cache indexes within the process; the
+# updates are serialized across processes by file locks.
+_D4TAlinkCacheLock = threading.RLock()
+
+# -------------------------------------------------------------------------------
+def _codeDigest(h,code):
+    """Update a hash with the bytecode, names and constants of a code object and of its nested code objects (inner functions, lambdas and comprehensions)."""
+    h.update(code.co_code)
+    h.update(repr((code.co_names,code.co_varnames)).encode())
+    for c in code.co_consts:
+        _constDigest(h,c)
+# -------------------------------------------------------------------------------
+def _constDigest(h,c):
+    """Update a hash with a constant of a code object. The order of the elements of a frozenset constant, e.g. of 'x in {"a","b"}', depends on the hash seed of the process, so that its elements are hashed in the order of their own digests; the tuples are hashed element by element, since they may hold frozensets and code objects."""
+    if isinstance(c, types.CodeType):
+        _codeDigest(h,c)
+    elif isinstance(c, (set, frozenset)):
+        digests = []
+        for x in c:
+            hx = hashlib.sha256()
+            _constDigest(hx,x)
+            digests.append(hx.digest())
+        h.update(f"{type(c).__name__}:{len(digests)}".encode())
+        for d in sorted(digests):
+            h.update(d)
+    elif isinstance(c, tuple):
+        h.update(f"tuple:{len(c)}".encode())
+        for x in c:
+            _constDigest(h,x)
+    else:
+        h.update(repr(c).encode())
+# -------------------------------------------------------------------------------
+def _cacheKey(name,f,args,kwargs):
+    """Get the cache key of a call: the SHA-256 digest of the cache name, the bytecode and default arguments of the function, and the pickled arguments."""
+    h = hashlib.sha256(name.encode())
+    h.update(f"{getattr(f,'__module__','')}.{getattr(f,'__qualname__','')}".encode())
+    code = getattr(f,"__code__",None)
+    if code is not None:
+        _codeDigest(h,code)
+    try:
+        h.update(pickle.dumps((getattr(f,"__defaults__",None),getattr(f,"__kwdefaults__",None),
+                               args,sorted(kwargs.items())),protocol=4))
+    except (pickle.PicklingError, TypeError, AttributeError) as e:
+        raise TypeError(f"The arguments of the cached function '{name}' cannot be pickled: {e}") from e
+    return h.hexdigest()
+# -------------------------------------------------------------------------------
+def _readCacheIndex(fn):
+    """Read a cache index; a missing or corrupted index is an empty one."""
+    try:
+        with open(fn,"r") as fp:
+            idx = json.load(fp)
+    except (FileNotFoundError, ValueError):
+        idx = {}
+    idx.setdefault("entries",{})
+    idx.setdefault("stats",{})
+    return idx
+# -------------------------------------------------------------------------------
+def _writeCacheIndex(fn,idx):
+    """Write a cache index, replacing the previous one atomically."""
+    def write(path):
+        with open(path,"w") as fp:
+            json.dump(idx,fp)
+    _atomicWrite(fn,write)
+# -------------------------------------------------------------------------------
+def _removeCacheEntry(dir,idx,key):
+    """Remove an entry from a cache index and its file from the cache directory."""
+    entry = idx["entries"].pop(key)
+    try:
+        os.remove(os.path.join(dir,entry["file"]))
+    except FileNotFoundError:
+        pass
+    return entry["bytes"]
+# -------------------------------------------------------------------------------
+def _evictCache(dir,idx,name,maxEntries=None,maxBytes=None):
+    """Remove the least recently used entries of a cache name until it has at most maxEntries entries and maxBytes bytes."""
+    freed = 0
+    keys = sorted((k for (k,e) in idx["entries"].items() if e["name"] == name),
+                  key=lambda k: idx["entries"][k]["used"])
+    size = sum(idx["entries"][k]["bytes"] for k in keys)
+    count = len(keys)
+    for key in keys:
+        if (maxEntries is None or count <= maxEntries) and (maxBytes is None or size <= maxBytes):
+            break
+        n = _removeCacheEntry(dir,idx,key)
+        size -= n
+        freed += n
+        count -= 1
+    return freed
+# -------------------------------------------------------------------------------
+def pruneTaskCaches(maxBytes=None, maxAge=None, sponsor=None, project=None, package=None):
+    """Prune the result caches of the tasks in the repository (see Task.cached). The least recently used results of all tasks are removed until the caches hold at most maxBytes bytes in total, and the results not used for more than maxAge days are removed. Only the part of the repository selected by the sponsor, project and package parameters is pruned.
+
+    Attributes:
+    maxBytes (int): The maximum total size of the caches in bytes (optional).
+    maxAge (float): The maximum age in days since the last use of a result (optional).
+    sponsor (str): Restrict the pruning to this sponsor (optional).
+    project (str): Restrict the pruning to this project (optional).
+    package (str): Restrict the pruning to this package (optional).
+
+    Returns:
+    int: The number of bytes freed.
+    """
+    pattern = os.path.join(glob.escape(getTaskRoot()),
+                           *[glob.escape(v) if v is not None else "*" for v in (sponsor,project,package)],
+                           "output","*","bin",_CACHE_SUBDIR,f"*_{_CACHE_SUBDIR}.json")
+    freed = 0
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(_D4TAlinkCacheLock)
+        fns = sorted(glob.glob(pattern))
+        for fn in fns:
+            stack.enter_context(fileLock(fn))
+        indexes = {fn: _readCacheIndex(fn) for fn in fns}
+        entries = sorted(((e["used"],fn,key,e["bytes"]) for (fn,idx) in indexes.items()
+                          for (key,e) in idx["entries"].items()))
+        size = sum(e[3] for e in entries)
+        oldest = None
+        if maxAge is not None:
+            oldest = datetime.fromtimestamp(datetime.now().timestamp() - maxAge * 86400).isoformat()
+        changed = set()
+        for (used,fn,key,n) in entries:
+            if (maxBytes is None or size <= maxBytes) and (oldest is None or used >= oldest):
+                continue
+            freed += _removeCacheEntry(os.path.dirname(fn),indexes[fn],key)
+            size -= n
+            changed.add(fn)
+        for fn in changed:
+            _writeCacheIndex(fn,indexes[fn])
+    return freed
+# -------------------------------------------------------------------------------
@@ -0,0 +1,201 @@
+"""
+D4TAlinkCatalog
+
+D4TAlink task catalog.
+"""
+
+__all__ = ["listTasks",
+           "refreshCatalog"]
+
+import os
+import json
+import time
+import sqlite3
+from datetime import date
+from .D4TAlinkPar import *
+from .D4TAlinkPar import _checkLocalStorage
+
+_CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    path TEXT PRIMARY KEY,
+    sponsor TEXT, project TEXT, package TEXT, task TEXT,
+    author TEXT, date TEXT, version TEXT,
+    mtime INTEGER, size INTEGER, metadata TEXT);
+CREATE INDEX IF NOT EXISTS tasks_spp ON tasks (sponsor, project, package);
+CREATE INDEX IF NOT EXISTS tasks_author ON tasks (author);
+CREATE INDEX IF NOT EXISTS tasks_date ON tasks (date);
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY, mtime INTEGER, entries TEXT);
+"""
+_TASK_COLUMNS = ["task", "project", "package", "sponsor", "author",
+                 "copyright", "date", "footer", "version", "dependencies"]
+# Directory listings whose mtime is this recent (ns) are not trusted, since a
+# later change within the same mtime tick would go unnoticed.
+_RACY_NS = 2 * 10**9
+
+# -------------------------------------------------------------------------------
+def _catalogPath(catalog=None):
+    """Get the file path of the catalog database. By default the catalog is stored in the '.d4talink' directory of the task root."""
+    if catalog is None:
+        catalog = os.path.join(getTaskRoot(), ".d4talink", "catalog.sqlite")
+    os.makedirs(os.path.dirname(os.path.abspath(catalog)), exist_ok=True)
+    return catalog
+# -------------------------------------------------------------------------------
+def _catalogConnect(catalog=None):
+    """Open a connection to the catalog database, creating the tables if needed."""
+    con = sqlite3.connect(_catalogPath(catalog), timeout=60)
+    con.executescript(_CATALOG_SCHEMA)
+    return con
+# -------------------------------------------------------------------------------
+def _listSubdirs(con, dirs, path, seen):
+    """List the subdirectories of a directory, reusing the cached listing when the directory mtime did not change. The function returns the listing, and whether it is the cached one."""
+    try:
+        st = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return ([], False)
+    seen.add(path)
+    cached = dirs.get(path)
+    if cached is not None and cached[0] == st.st_mtime_ns:
+        return (json.loads(cached[1]), True)
+    entries = sorted(e.name for e in os.scandir(path)
+                     if not e.name.startswith(".") and e.is_dir())
+    mtime = st.st_mtime_ns
+    if time.time_ns() - mtime < _RACY_NS:
+        mtime = -1
+    con.execute("INSERT OR REPLACE INTO dirs (path, mtime, entries) VALUES (?,?,?)",
+                (path, mtime, json.dumps(entries)))
+    return (entries, False)
+# -------------------------------------------------------------------------------
+def _inScope(path, root, levels, walked):
+    """Check if a catalog entry is in the part of the repository walked by a refresh: below a package directory walked, or below a directory whose listing no longer holds the entry. The walked directories are given per level, sponsor, project and package."""
+    parts = os.path.relpath(path, root).split(os.sep)
+    if parts[0] in (".", ".."):
+        return False
+    for (i, lvl) in enumerate(levels):
+        if i >= len(parts):
+            return False
+        if os.path.join(root, *parts[:i + 1]) not in walked[i]:
+            return lvl is None
+    return len(parts) > len(levels)
+# -------------------------------------------------------------------------------
+def refreshCatalog(sponsor=None, project=None, package=None, full=False, files=False, catalog=None):
+    """Refresh the task catalog. The catalog requires a storage backend of local files (see setTaskStorage). The task repository is walked below the task root, or below the sponsor/project/package directory if these are specified. Directory listings are only re-read when the directory mtime changed, and task files are only re-parsed when their mtime or size changed. The task files are only looked up in the output directories whose mtime changed, which the tasks touch when they rewrite their task file, so that an unchanged repository costs one stat per directory rather than one per task; if the files parameter is set to True, all the task files are looked up, e.g. to see the task files edited outside of D4TAlink. The tasks whose file is gone are removed from the catalog, within the part of the repository walked only: e.g. refreshing a project leaves the other projects untouched. If the full parameter is set to True, the cached listings are ignored and every task file is re-parsed.
+
+    Attributes:
+    sponsor (str): Restrict the refresh to this sponsor (optional).
+    project (str): Restrict the refresh to this project (optional).
+    package (str): Restrict the refresh to this package (optional).
+    full (bool): A flag to force a full rescan.
+    files (bool): A flag to look up all the task files.
+    catalog (str): The file path of the catalog database (optional).
+
+    Returns:
+    dict: The number of tasks scanned, updated and removed.
+    """
+    _checkLocalStorage("The task catalog")
+    root = getTaskRoot()
+    con = _catalogConnect(catalog)
+    try:
+        with con:
+            dirs = {} if full else {p: (m, e) for (p, m, e) in
+                                    con.execute("SELECT path, mtime, entries FROM dirs")}
+            known = {p: (m, s) for (p, m, s) in
+                     con.execute("SELECT path, mtime, size FROM tasks")}
+            seenDirs = set()
+            seenTasks = set()
+            stats = {"scanned": 0, "updated": 0, "removed": 0}
+            levels = [sponsor, project, package]
+            paths = [root]
+            walked = []
+            for lvl in levels:
+                nxt = []
+                for p in paths:
+                    names = [lvl] if lvl is not None else _listSubdirs(con, dirs, p, seenDirs)[0]
+                    nxt.extend(os.path.join(p, n) for n in names)
+                paths = nxt
+                walked.append(set(paths))
+            for p in paths:
+                output = os.path.join(p, "output")
+                (names, cached) = _listSubdirs(con, dirs, output, seenDirs)
+                for t in names:
+                    fn = os.path.join(output, t, "bin", f"{t}_task.json")
+                    if cached and not files and fn in known:
+                        stats["scanned"] += 1
+                        seenTasks.add(fn)
+                        continue
+                    try:
+                        st = os.stat(fn)
+                    except (FileNotFoundError, NotADirectoryError):
+                        continue
+                    stats["scanned"] += 1
+                    seenTasks.add(fn)
+                    if not full and known.get(fn) == (st.st_mtime_ns, st.st_size):
+                        continue
+                    with open(fn, "r") as fp:
+                        ita = json.load(fp)
+                    con.execute("INSERT OR REPLACE INTO tasks VALUES (?,?,?,?,?,?,?,?,?,?,?)",
+                                (fn, ita.get("sponsor"), ita.get("project"),
+                                 ita.get("package"), ita.get("task", t),
+                                 ita.get("author"), ita.get("date"), ita.get("version"),
+                                 st.st_mtime_ns, st.st_size, json.dumps(ita)))
+                    stats["updated"] += 1
+            for fn in known:
+                if fn not in seenTasks and _inScope(fn, root, levels, walked):
+                    con.execute("DELETE FROM tasks WHERE path = ?", (fn,))
+                    stats["removed"] += 1
+            for p in list(dirs):
+                if p not in seenDirs and _inScope(p, root, levels, walked):
+                    con.execute("DELETE FROM dirs WHERE path = ?", (p,))
+    finally:
+        con.close()
+    return stats
+# -------------------------------------------------------------------------------
+def listTasks(project=None, package=None, sponsor=None, author=None,
+              dateFrom=None, dateTo=None, refresh=True, catalog=None, allSponsors=False):
+    """List the tasks in the repository. The tasks are read from the task catalog, which is refreshed incrementally beforehand if the refresh parameter is set to True (see refreshCatalog). The tasks are those of the sponsor parameter, or of the sponsor set by setTaskSponsor by default, or of all sponsors if the allSponsors parameter is set to True. Only the part of the repository selected by the sponsor, project and package parameters is rescanned. The function returns a DataFrame with one row per task and the task attributes as columns.
+
+    Attributes:
+    project (str): The project of the tasks (optional).
+    package (str): The package of the tasks (optional).
+    sponsor (str): The sponsor of the tasks; getTaskSponsor() by default (optional).
+    author (str): The author of the tasks (optional).
+    dateFrom (str): The earliest task date, formatted as 'YYYY-MM-DD' (optional).
+    dateTo (str): The latest task date, formatted as 'YYYY-MM-DD' (optional).
+    refresh (bool): A flag to refresh the catalog before the query.
+    catalog (str): The file path of the catalog database (optional).
+    allSponsors (bool): A flag to list the tasks of all sponsors.
+
+    Returns:
+    DataFrame: The tasks matching the filters.
+    """
+    _checkLocalStorage("The task catalog")
+    if sponsor is None and not allSponsors:
+        sponsor = getTaskSponsor()
+    if refresh:
+        refreshCatalog(sponsor, project, package, catalog=catalog)
+    if isinstance(dateFrom, date):
+        dateFrom = dateFrom.strftime('%Y-%m-%d')
+    if isinstance(dateTo, date):
+        dateTo = dateTo.strftime('%Y-%m-%d')
+    where = []
+    args = []
+    for (col, op, v) in [("sponsor", "=", sponsor), ("project", "=", project),
+                         ("package", "=", package), ("author", "=", author),
+                         ("date", ">=", dateFrom), ("date", "<=", dateTo)]:
+        if v is not None:
+            where.append(f"{col} {op} ?")
+            args.append(v)
+    sql = "SELECT metadata FROM tasks"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY sponsor, project, package, task"
+    con = _catalogConnect(catalog)
+    try:
+        rows = [json.loads(m) for (m,) in con.execute(sql, args)]
+    finally:
+        con.close()
+    import pandas as pd
+    df = pd.DataFrame(rows)
+    cols = _TASK_COLUMNS + [c for c in df.columns if c not in _TASK_COLUMNS]
+    return df.reindex(columns=cols)
+# -------------------------------------------------------------------------------
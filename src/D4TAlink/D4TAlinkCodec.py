@@ -0,0 +1,134 @@
+"""
+D4TAlinkCodec
+
+D4TAlink compression codecs.
+"""
+
+__all__ = ["registerCodec",
+           "listCodecs",
+           "detectCodec",
+           "benchmarkCodecs"]
+
+import os
+import gzip
+import bz2
+import lzma
+import time
+import pickle
+import tempfile
+import importlib
+import importlib.util
+
+# Registered codecs: file extension, magic number and opener.
+_D4TAlinkCodecs = {}
+
+# -------------------------------------------------------------------------------
+def registerCodec(name,ext,magic,opener):
+    """Register a compression codec. The opener is called with a file path, a binary mode ('rb' or 'wb') and a compression level (None for the default level), and returns a file object compressing or decompressing the data as it is written or read.
+
+    Attributes:
+    name (str): The name of the codec.
+    ext (str): The file extension of the codec, e.g. 'gz'.
+    magic (bytes): The first bytes of the files written by the codec.
+    opener (function): The function opening a compressed file.
+
+    Returns:
+    str: The name of the codec.
+    """
+    _D4TAlinkCodecs[name] = {"ext": ext, "magic": magic, "open": opener}
+    return name
+# -------------------------------------------------------------------------------
+def listCodecs():
+    """List the registered compression codecs. The stdlib codecs 'gzip', 'bz2' and 'xz' are always registered; 'zstd' and 'lz4' are registered when the 'zstandard' and 'lz4' packages are installed.
+
+    Returns:
+    list: The names of the codecs.
+    """
+    return list(_D4TAlinkCodecs)
+# -------------------------------------------------------------------------------
+def _codec(name):
+    """Get a registered codec."""
+    if name not in _D4TAlinkCodecs:
+        raise ValueError(f"Compression codec '{name}' not recognized or not installed.")
+    return _D4TAlinkCodecs[name]
+# -------------------------------------------------------------------------------
+def _codecOpen(fn,mode,codec=None,level=None):
+    """Open a file, compressed with a codec if one is given."""
+    if codec is None:
+        return open(fn,mode)
+    return _codec(codec)["open"](fn,mode,level)
+# -------------------------------------------------------------------------------
+def _magicCodec(head):
+    """Get the codec whose magic number starts the given bytes."""
+    for (name,c) in _D4TAlinkCodecs.items():
+        if head.startswith(c["magic"]):
+            return name
+    return None
+# -------------------------------------------------------------------------------
+def detectCodec(fn):
+    """Detect the compression codec of a file from its first bytes.
+
+    Attributes:
+    fn (str): The file path.
+
+    Returns:
+    str: The name of the codec, or None if the file is not compressed with a registered codec.
+    """
+    with open(fn,"rb") as fp:
+        return _magicCodec(fp.read(16))
+# -------------------------------------------------------------------------------
+def benchmarkCodecs(obj,codecs=None,levels=None,bandwidth=100,dir=None):
+    """Benchmark the compression codecs on a sample object. The object is pickled through each codec to a temporary file and read back. The estimated time of a save and a read is the compression and decompression time plus the time to transfer the compressed data twice at the given storage bandwidth; the codecs are returned sorted by estimated time, so that the first row is the best trade-off for this bandwidth.
+
+    Attributes:
+    obj (object): The sample object.
+    codecs (list): The codecs to benchmark; all registered codecs by default (optional).
+    levels (list): The compression levels to benchmark; the default level only by default (optional).
+    bandwidth (float): The storage bandwidth in MB/s.
+    dir (str): The directory for the temporary files, ideally on the target storage (optional).
+
+    Returns:
+    DataFrame: The codec, level, size, compression ratio, write and read times in seconds, and estimated time.
+    """
+    if codecs is None:
+        codecs = listCodecs()
+    if levels is None:
+        levels = [None]
+    raw = len(pickle.dumps(obj))
+    rows = []
+    with tempfile.TemporaryDirectory(dir=dir) as tmp:
+        for codec in [None] + list(codecs):
+            for level in ([None] if codec is None else levels):
+                fn = os.path.join(tmp,f"sample-{codec}-{level}")
+                t0 = time.perf_counter()
+                with _codecOpen(fn,"wb",codec,level) as fp:
+                    pickle.dump(obj,fp)
+                t1 = time.perf_counter()
+                with _codecOpen(fn,"rb",codec) as fp:
+                    pickle.load(fp)
+                t2 = time.perf_counter()
+                size = os.path.getsize(fn)
+                os.remove(fn)
+                rows.append({"codec": codec, "level": level, "size": size,
+                             "ratio": raw / size, "write": t1 - t0, "read": t2 - t1,
+                             "estimate": t2 - t0 + 2 * size / (bandwidth * 1e6)})
+    import pandas as pd
+    return pd.DataFrame(rows).sort_values("estimate").reset_index(drop=True)
+# -------------------------------------------------------------------------------
+registerCodec("gzip","gz",b"\x1f\x8b",
+              lambda fn,mode,level: gzip.open(fn,mode,compresslevel=9 if level is None else level))
+registerCodec("bz2","bz2",b"BZh",
+              lambda fn,mode,level: bz2.open(fn,mode,compresslevel=9 if level is None else level))
+registerCodec("xz","xz",b"\xfd7zXZ\x00",
+              lambda fn,mode,level: lzma.open(fn,mode,preset=None if mode[0] == "r" else level))
+# The optional codecs are registered if their package is installed, and only imported when used.
+if importlib.util.find_spec("zstandard") is not None:
+    def _zstdOpen(fn,mode,level):
+        zstandard = importlib.import_module("zstandard")
+        return zstandard.open(fn,mode,cctx=zstandard.ZstdCompressor(level=3 if level is None else level))
+    registerCodec("zstd","zst",b"\x28\xb5\x2f\xfd",_zstdOpen)
+if importlib.util.find_spec("lz4") is not None:
+    def _lz4Open(fn,mode,level):
+        return importlib.import_module("lz4.frame").open(fn,mode,compression_level=level or 0)
+    registerCodec("lz4","lz4",b"\x04\x22\x4d\x18",_lz4Open)
+# -------------------------------------------------------------------------------
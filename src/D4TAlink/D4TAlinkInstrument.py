@@ -0,0 +1,211 @@
+"""
+D4TAlinkInstrument
+
+D4TAlink I/O instrumentation.
+"""
+
+__all__ = ["addIOHook",
+           "removeIOHook",
+           "IOStats",
+           "IOLogger",
+           "IOSidecar"]
+
+import os
+import sys
+import json
+import time
+import logging
+import functools
+import threading
+from datetime import datetime
+from .D4TAlinkPar import *
+
+_log = logging.getLogger("D4TAlink")
+
+# Registered hooks, called with the task and the event of each I/O operation.
+_D4TAlinkHooks = []
+# Event being recorded by the current thread.
+_D4TAlinkTrace = threading.local()
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# -------------------------------------------------------------------------------
+def addIOHook(hook):
+    """Add a hook called after each I/O operation of the tasks. The exceptions raised by the hook are logged, not raised. The hook is called with the task (None for directory creations) and a dictionary describing the operation: time, operation, task, path, number of files, format, bytes read or written, duration in seconds, caller, and error if the operation failed. While no hook is registered, the instrumentation costs a single test per operation.
+
+    Attributes:
+    hook (function): The hook.
+
+    Returns:
+    function: The hook.
+    """
+    _D4TAlinkHooks.append(hook)
+    return hook
+# -------------------------------------------------------------------------------
+def removeIOHook(hook):
+    """Remove a hook added by addIOHook.
+
+    Attributes:
+    hook (function): The hook.
+    """
+    _D4TAlinkHooks.remove(hook)
+# -------------------------------------------------------------------------------
+def _caller():
+    """Get the first frame outside of the D4TAlink package, as 'file:line function'."""
+    f = sys._getframe(2)
+    while f is not None and os.path.dirname(os.path.abspath(f.f_code.co_filename)) == _PACKAGE_DIR:
+        f = f.f_back
+    if f is None:
+        return None
+    return f"{f.f_code.co_filename}:{f.f_lineno} {f.f_code.co_name}"
+# -------------------------------------------------------------------------------
+def _emit(task,event):
+    """Call the hooks with an event. The I/O operation is complete when its event is emitted, so that the exceptions of the hooks are logged rather than raised: a faulty hook does not make a successful operation look failed, nor replace the error of a failed one."""
+    for hook in list(_D4TAlinkHooks):
+        try:
+            hook(task,event)
+        except Exception:
+            _log.exception(f"I/O hook {hook!r} failed on '{event['op']}'.")
+# -------------------------------------------------------------------------------
+def _traceFile(fn):
+    """Record a file read or written by the I/O operation of the current thread."""
+    if _D4TAlinkHooks:
+        paths = getattr(_D4TAlinkTrace,"paths",None)
+        if paths is not None:
+            paths.append(fn)
+# -------------------------------------------------------------------------------
+def _traceMkdir(path,seconds):
+    """Record the creation of a directory."""
+    if _D4TAlinkHooks:
+        _emit(None,{"time": datetime.now().isoformat(), "op": "mkdir", "task": None,
+                    "path": path, "files": 0, "format": None, "bytes": 0,
+                    "seconds": seconds, "caller": _caller(), "error": None})
+# -------------------------------------------------------------------------------
+def _instrumented(f):
+    """Decorate a Task I/O method, so that its operations are reported to the hooks."""
+    @functools.wraps(f)
+    def wrapper(self,*args,**kwargs):
+        if not _D4TAlinkHooks or getattr(_D4TAlinkTrace,"paths",None) is not None:
+            return f(self,*args,**kwargs)
+        _D4TAlinkTrace.paths = paths = []
+        error = None
+        t0 = time.perf_counter()
+        try:
+            return f(self,*args,**kwargs)
+        except BaseException as e:
+            error = repr(e)
+            raise
+        finally:
+            seconds = time.perf_counter() - t0
+            _D4TAlinkTrace.paths = None
+            size = 0
+            for fn in paths:
+                try:
+                    size += os.path.getsize(fn)
+                except OSError:
+                    pass
+            path = paths[0] if paths else None
+            format = None
+            if path is not None:
+                name = os.path.basename(path)
+                format = name.split(".",1)[1] if "." in name else None
+            _emit(self,{"time": datetime.now().isoformat(), "op": f.__name__,
+                        "task": str(self), "path": path, "files": len(paths),
+                        "format": format, "bytes": size, "seconds": seconds,
+                        "caller": _caller(), "error": error})
+    return wrapper
+# -------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------
+class IOStats:
+    """In-memory aggregator of the I/O operations of the tasks, to be registered with addIOHook. The summary gives the number of operations, the bytes and the duration percentiles per operation and format.
+
+    Attributes:
+    maxEvents (int): The maximum number of events kept, the oldest being dropped (optional).
+
+    Methods:
+    events(): Get the recorded events.
+    summary(by): Get the summary of the recorded events.
+    clear(): Clear the recorded events.
+    """
+    # -------------------------------------
+    def __init__(self,maxEvents=None):
+        self.maxEvents = maxEvents
+        self._events = []
+        self._lock = threading.Lock()
+    # -------------------------------------
+    def __call__(self,task,event):
+        with self._lock:
+            self._events.append(event)
+            if self.maxEvents is not None and len(self._events) > self.maxEvents:
+                del self._events[:len(self._events) - self.maxEvents]
+    # -------------------------------------
+    def events(self):
+        """Get the recorded events.
+
+        Returns:
+        DataFrame: The recorded events.
+        """
+        import pandas as pd
+        with self._lock:
+            return pd.DataFrame(list(self._events))
+    # -------------------------------------
+    def summary(self,by=("op","format")):
+        """Get the summary of the recorded events: number of operations, total bytes, total duration, and median, 90th and 99th percentiles of the duration, in seconds.
+
+        Attributes:
+        by (list): The event fields to group by, e.g. ('task', 'op').
+
+        Returns:
+        DataFrame: The summary.
+        """
+        df = self.events()
+        if df.empty:
+            return df
+        import pandas as pd
+        g = df.groupby(list(by),dropna=False)
+        return pd.DataFrame({"count": g["seconds"].count(),
+                             "bytes": g["bytes"].sum(),
+                             "seconds": g["seconds"].sum(),
+                             "p50": g["seconds"].quantile(0.5),
+                             "p90": g["seconds"].quantile(0.9),
+                             "p99": g["seconds"].quantile(0.99)}).reset_index()
+    # -------------------------------------
+    def clear(self):
+        """Clear the recorded events."""
+        with self._lock:
+            self._events = []
+# -------------------------------------------------------------------------------
+class IOLogger:
+    """Hook logging the I/O operations of the tasks, to be registered with addIOHook.
+
+    Attributes:
+    logger (Logger): The logger; the 'D4TAlink' logger by default (optional).
+    level (int): The logging level.
+    """
+    # -------------------------------------
+    def __init__(self,logger=None,level=logging.DEBUG):
+        self.logger = logger if logger is not None else logging.getLogger("D4TAlink")
+        self.level = level
+    # -------------------------------------
+    def __call__(self,task,event):
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level,"%s %s %s %d bytes %.6fs %s",event["op"],event["task"],
+                            event["path"],event["bytes"],event["seconds"],event["caller"],
+                            extra={"d4talink": event})
+# -------------------------------------------------------------------------------
+class IOSidecar:
+    """Hook persisting the I/O operations of each task as JSON lines, in the '<task>_io.jsonl' file next to the '<task>_task.json' file, to be registered with addIOHook. Directory creations, which belong to no task, are not persisted, nor are the operations with a storage backend without local files (see setTaskStorage), which cannot append to a file."""
+    # -------------------------------------
+    def __init__(self):
+        self._lock = threading.Lock()
+    # -------------------------------------
+    def __call__(self,task,event):
+        storage = getTaskStorage()
+        if task is None or not storage.local:
+            return
+        fn = task.binaryFn("io","jsonl")
+        with self._lock:
+            with open(fn,"a") as fp:
+                fp.write(json.dumps(event) + "\n")
+            storage.commit(fn)
+# -------------------------------------------------------------------------------
@@ -0,0 +1,139 @@
+"""
+D4TAlinkLock
+
+D4TAlink atomic writes and file locks.
+"""
+
+__all__ = ["fileLock"]
+
+import os
+import time
+import uuid
+import hashlib
+import threading
+import contextlib
+from .D4TAlinkPar import *
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Locks of the files locked by the threads of the process, since fcntl locks
+# are held by the process and do not exclude its other threads.
+_D4TAlinkLocks = {}
+_D4TAlinkLocksLock = threading.Lock()
+
+# -------------------------------------------------------------------------------
+def _fsyncDir(path):
+    """Flush a directory to disk, so that a file renamed into it survives a crash of the machine."""
+    try:
+        fd = os.open(path,os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+# -------------------------------------------------------------------------------
+def _fsyncFile(fn):
+    """Flush a file to disk."""
+    fd = os.open(fn,os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+# -------------------------------------------------------------------------------
+def _atomicWrite(fn,write,fsync=None):
+    """Write a file atomically: the write function writes the content to a hidden temporary file of the same directory, with the same extension, which is then renamed to the file path. Readers see either the previous or the new file, never a partial one, and a failed write leaves the previous file untouched. If the fsync parameter is set to True, or is not set and getTaskFsync is set, the file and its directory are flushed to disk."""
+    if fsync is None:
+        fsync = getTaskFsync()
+    (path,name) = os.path.split(fn)
+    tfn = os.path.join(path,f".{uuid.uuid4().hex[:12]}.{name}")
+    try:
+        write(tfn)
+        if fsync:
+            _fsyncFile(tfn)
+        os.replace(tfn,fn)
+    except BaseException:
+        try:
+            os.remove(tfn)
+        except FileNotFoundError:
+            pass
+        raise
+    if fsync:
+        _fsyncDir(path or ".")
+    return fn
+# -------------------------------------------------------------------------------
+def _lockPath(fn):
+    """Get the path of the lock file of a file, in the '.d4talink/locks' directory of the task root."""
+    digest = hashlib.sha1(os.path.abspath(fn).encode()).hexdigest()
+    return os.path.join(getTaskRoot(check=False),".d4talink","locks",digest[:2],digest)
+# -------------------------------------------------------------------------------
+@contextlib.contextmanager
+def fileLock(fn, timeout=None):
+    """Lock a file for the duration of a with block, e.g. to read, update and write a file shared by several processes. The lock is advisory: it only excludes the threads and processes locking the same file. It is held on a separate lock file in the '.d4talink/locks' directory of the task root, so that the locked file can be replaced while it is locked; the lock file is removed when the lock is released. Across machines, it requires a filesystem supporting fcntl locks, e.g. NFS with lockd. Without fcntl (e.g. on Windows), or with a storage backend without local files (see setTaskStorage), only the threads of the process are excluded.
+
+    Attributes:
+    fn (str): The file path.
+    timeout (float): The maximum time to wait for the lock in seconds, in all; no limit by default (optional).
+
+    Returns:
+    str: The file path.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    lfn = _lockPath(fn)
+    with _D4TAlinkLocksLock:
+        lock = _D4TAlinkLocks.setdefault(lfn,threading.Lock())
+    if not lock.acquire(timeout=-1 if timeout is None else timeout):
+        raise TimeoutError(f"File '{fn}' is locked.")
+    try:
+        if fcntl is None or not getTaskStorage().local:
+            yield fn
+            return
+        fd = _lockFile(fn,lfn,deadline)
+        try:
+            yield fn
+        finally:
+            # Remove the lock file while holding it: the processes waiting on it
+            # then find that it is no longer the file at the path, and retry.
+            try:
+                os.remove(lfn)
+            except FileNotFoundError:
+                pass
+            fcntl.lockf(fd,fcntl.LOCK_UN)
+            os.close(fd)
+    finally:
+        lock.release()
+# -------------------------------------------------------------------------------
+def _lockFile(fn,lfn,deadline):
+    """Lock the lock file of a file with fcntl, until the deadline if one is given, and return its file descriptor. The lock file is created if needed; if it was removed by the previous holder of the lock while waiting for it, the lock is taken again on the new lock file."""
+    while True:
+        try:
+            fd = os.open(lfn,os.O_RDWR | os.O_CREAT,0o666)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(lfn),exist_ok=True)
+            continue
+        try:
+            if deadline is None:
+                fcntl.lockf(fd,fcntl.LOCK_EX)
+            else:
+                while True:
+                    try:
+                        fcntl.lockf(fd,fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        break
+                    except OSError:
+                        if time.monotonic() >= deadline:
+                            raise TimeoutError(f"File '{fn}' is locked.")
+                        time.sleep(0.01)
+            try:
+                if os.stat(lfn).st_ino == os.fstat(fd).st_ino:
+                    return fd
+            except FileNotFoundError:
+                pass
+            fcntl.lockf(fd,fcntl.LOCK_UN)
+        except BaseException:
+            os.close(fd)
+            raise
+        os.close(fd)
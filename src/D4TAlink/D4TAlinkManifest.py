@@ -0,0 +1,357 @@
+"""
+D4TAlinkManifest
+
+D4TAlink integrity manifest of the task artifacts.
+"""
+
+__all__ = ["verifyTask",
+           "verifyRepository"]
+
+import os
+import json
+import time
+import uuid
+import atexit
+import logging
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from .D4TAlinkPar import *
+from .D4TAlinkPar import _checkLocalStorage
+from .D4TAlinkLock import fileLock, _atomicWrite
+from .D4TAlinkStore import _hashFile
+from .D4TAlinkCatalog import listTasks
+from .D4TAlinkStorage import LocalBackend
+
+_log = logging.getLogger("D4TAlink")
+
+# Records not yet appended to the journals of the manifests, keyed by manifest
+# path, with the lock of each journal, since the records of the threads of the
+# process are appended in batches (see _updateManifests).
+_D4TAlinkJournals = {}
+_D4TAlinkJournalsLock = threading.Lock()
+# A batch of records is appended once it has this many records, or this many
+# seconds after its first record.
+_JOURNAL_BATCH = 64
+_JOURNAL_DELAY = 1.0
+
+# -------------------------------------------------------------------------------
+def _manifestPath(data,taskname):
+    """Get the file path of the manifest of a task, beside its task file."""
+    return os.path.join(data,"bin",f"{taskname}_manifest.json")
+# -------------------------------------------------------------------------------
+def _journalPath(mfn):
+    """Get the file path of the journal of a manifest, beside it: the records not yet compacted into the manifest, one JSON line each."""
+    return os.path.splitext(mfn)[0] + ".jsonl"
+# -------------------------------------------------------------------------------
+def _tracked(data,taskname,rel):
+    """Check if a file of the output directory of a task is tracked by its manifest: the manifest and its journal, the I/O sidecar, the result cache and the hidden files are not."""
+    parts = rel.split("/")
+    if any(p.startswith(".") for p in parts):
+        return False
+    if parts[0] == "bin" and len(parts) > 1:
+        if len(parts) == 2 and parts[1] in (f"{taskname}_manifest.json",f"{taskname}_manifest.jsonl",
+                                          f"{taskname}_io.jsonl"):
+            return False
+        if len(parts) > 2 and parts[1] == "cache":
+            return False
+    return True
+# -------------------------------------------------------------------------------
+def _artifactKey(fn):
+    """Get the output directory, task name and relative path of an artifact, or None if the file is not in the output directory of a task of the task root."""
+    try:
+        rel = os.path.relpath(os.path.abspath(fn),os.path.abspath(getTaskRoot(check=False)))
+    except ValueError:
+        return None
+    parts = rel.split(os.sep)
+    if len(parts) < 6 or parts[3] != "output" or parts[0] == "..":
+        return None
+    data = os.path.join(getTaskRoot(check=False),*parts[:5])
+    rel = "/".join(parts[5:])
+    if not _tracked(data,parts[4],rel):
+        return None
+    return (data,parts[4],rel)
+# -------------------------------------------------------------------------------
+def _readManifest(fn,journal=None):
+    """Read a manifest, with the records of its journal applied in order, those of the process included; a missing manifest is an empty one. A last line cut by a crash of its writer is ignored. The journal is read from another path if the journal parameter is given."""
+    _flushJournals([fn])
+    try:
+        with open(fn,"r") as fp:
+            manifest = json.load(fp)
+    except FileNotFoundError:
+        manifest = {"files": {}}
+    try:
+        with open(_journalPath(fn) if journal is None else journal,"r") as fp:
+            for line in fp:
+                try:
+                    (rel,entry) = json.loads(line)
+                except ValueError:
+                    continue
+                if entry is None:
+                    manifest["files"].pop(rel,None)
+                else:
+                    manifest["files"][rel] = entry
+    except FileNotFoundError:
+        pass
+    return manifest
+# -------------------------------------------------------------------------------
+def _writeManifest(fn,manifest):
+    """Write a manifest, atomically, and hand it over to the storage backend."""
+    def write(path):
+        with open(path,"w") as fp:
+            json.dump(manifest,fp)
+    _atomicWrite(fn,write)
+    getTaskStorage().commit(fn)
+# -------------------------------------------------------------------------------
+def _entry(fn,digest=None,st=None):
+    """Get the manifest entry of a file: size, mtime in ns, SHA-256 digest and time of the record. The file is not read: a digest not given, i.e. not computed while writing the file, is None until verifyTask computes it."""
+    if st is None:
+        st = os.stat(fn)
+    return {"size": st.st_size, "mtime": st.st_mtime_ns, "sha256": digest,
+            "recorded": datetime.now().isoformat()}
+# -------------------------------------------------------------------------------
+def _appendJournal(mfn,lines,fsync=False):
+    """Append lines to the journal of a manifest, in a single write to the file opened in append mode, so that the lines of concurrent processes are not interleaved. If the journal is renamed meanwhile by a compaction (see _updateManifests), which may have read it before the write, the lines are appended again to the new journal; recording a file twice is harmless. The function returns False if the directory of the manifest does not exist."""
+    jfn = _journalPath(mfn)
+    data = "".join(lines).encode()
+    while True:
+        try:
+            fd = os.open(jfn,os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os,"O_BINARY",0),0o666)
+        except FileNotFoundError:
+            return False
+        try:
+            os.write(fd,data)
+            if fsync:
+                os.fsync(fd)
+            ino = os.fstat(fd).st_ino
+        finally:
+            os.close(fd)
+        try:
+            if os.stat(jfn).st_ino == ino:
+                return True
+        except FileNotFoundError:
+            pass
+# -------------------------------------------------------------------------------
+def _journal(mfn):
+    """Get the batch of records not yet appended to the journal of a manifest, with its lock."""
+    with _D4TAlinkJournalsLock:
+        return _D4TAlinkJournals.setdefault(mfn,{"lock": threading.Lock(), "lines": []})
+# -------------------------------------------------------------------------------
+def _flushJournals(mfns=None):
+    """Append the batches of records of the process to the journals of their manifests, of all manifests by default."""
+    with _D4TAlinkJournalsLock:
+        mfns = list(_D4TAlinkJournals) if mfns is None else [m for m in mfns if m in _D4TAlinkJournals]
+    for mfn in mfns:
+        batch = _journal(mfn)
+        with batch["lock"]:
+            if batch["lines"]:
+                (lines,batch["lines"]) = (batch["lines"],[])
+                _appendJournal(mfn,lines)
+atexit.register(_flushJournals)
+def _resetJournals():
+    """Forget the batches of records in a forked child process, which its parent appends."""
+    global _D4TAlinkJournalsLock
+    _D4TAlinkJournals.clear()
+    _D4TAlinkJournalsLock = threading.Lock()
+if hasattr(os,"register_at_fork"):
+    os.register_at_fork(before=_flushJournals,after_in_child=_resetJournals)
+# -------------------------------------------------------------------------------
+def _updateManifests(changes,compact=False):
+    """Apply changes to the manifests of tasks; the changes are lists of (relative path, entry) pairs keyed by (output directory, task name), where a None entry removes the file. The changes are appended to the journal of the manifest, so that recording a file costs the same however many files the task has. With the LocalBackend storage, and unless getTaskFsync is set, the records of the process are appended in batches, under a lock of the process rather than a file lock: a batch is appended once it has 64 records, a second after its first record, when a manifest is read, and when the process exits; the records of another process may thus be seen up to a second late. If the compact parameter is set to True, the journal and the changes are compacted into the manifest instead, under a file lock, and the journal is removed: it is renamed first, so that a concurrent append is not lost (see _appendJournal). The manifests are only kept with a storage backend of local files."""
+    storage = getTaskStorage()
+    if not storage.local:
+        return
+    fsync = getTaskFsync()
+    for ((data,taskname),items) in changes.items():
+        mfn = _manifestPath(data,taskname)
+        if not compact:
+            if not items:
+                continue
+            lines = [json.dumps([rel,entry]) + "\n" for (rel,entry) in items]
+            batch = _journal(mfn)
+            with batch["lock"]:
+                if isinstance(storage, LocalBackend) and not fsync:
+                    if not batch["lines"]:
+                        timer = threading.Timer(_JOURNAL_DELAY,_flushJournals,[[mfn]])
+                        timer.daemon = True
+                        timer.start()
+                    batch["lines"].extend(lines)
+                    if len(batch["lines"]) < _JOURNAL_BATCH:
+                        continue
+                    (lines,batch["lines"]) = (batch["lines"],[])
+                elif batch["lines"]:
+                    (lines,batch["lines"]) = (batch["lines"] + lines,[])
+                if _appendJournal(mfn,lines,fsync):
+                    storage.commit(_journalPath(mfn),fsync)
+            continue
+        if not os.path.isdir(os.path.dirname(mfn)):
+            continue
+        jfn = _journalPath(mfn)
+        if not items and not os.path.exists(jfn):
+            continue
+        with fileLock(mfn):
+            _flushJournals([mfn])
+            (path,name) = os.path.split(jfn)
+            tfn = os.path.join(path,f".{uuid.uuid4().hex[:12]}.{name}")
+            try:
+                os.replace(jfn,tfn)
+            except FileNotFoundError:
+                tfn = None
+            manifest = _readManifest(mfn,tfn if tfn is not None else jfn)
+            for (rel,entry) in items:
+                if entry is None:
+                    manifest["files"].pop(rel,None)
+                else:
+                    manifest["files"][rel] = entry
+            _writeManifest(mfn,manifest)
+            if tfn is not None:
+                os.remove(tfn)
+                if not isinstance(storage, LocalBackend) and not os.path.exists(jfn):
+                    # Remove the copy of the journal kept by the storage backend, e.g. the
+                    # remote copy of a CachedBackend.
+                    try:
+                        storage.remove(jfn)
+                    except FileNotFoundError:
+                        pass
+# -------------------------------------------------------------------------------
+def _recordArtifacts(fns,digests=None,stats=None):
+    """Record the size, mtime and SHA-256 digest of artifacts just written in the manifests of their tasks. The digests are those computed while writing, e.g. by the blob store; the artifacts are not read again. The stat results of the artifacts are taken if given, e.g. from the file object written, rather than from the file path."""
+    changes = {}
+    for (i,fn) in enumerate(fns):
+        key = _artifactKey(fn)
+        if key is None:
+            continue
+        digest = digests[i] if digests is not None else None
+        st = stats[i] if stats is not None else None
+        changes.setdefault(key[:2],[]).append((key[2],_entry(fn,digest,st)))
+    _updateManifests(changes)
+# -------------------------------------------------------------------------------
+def _removeArtifacts(fns):
+    """Remove artifacts, and their records from the manifests of their tasks; the records of the artifacts already removed are removed as well."""
+    changes = {}
+    for fn in fns:
+        try:
+            getTaskStorage().remove(fn)
+        except FileNotFoundError:
+            pass
+        key = _artifactKey(fn)
+        if key is not None:
+            changes.setdefault(key[:2],[]).append((key[2],None))
+    _updateManifests(changes)
+# -------------------------------------------------------------------------------
+def _scanTask(data,taskname):
+    """List the tracked files of the output directory of a task, with their stat results."""
+    files = {}
+    stack = [(data,"")]
+    while stack:
+        (path,prefix) = stack.pop()
+        try:
+            it = os.scandir(path)
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        with it:
+            for e in it:
+                rel = prefix + e.name
+                if e.is_dir(follow_symlinks=False):
+                    stack.append((e.path,rel + "/"))
+                elif _tracked(data,taskname,rel):
+                    files[rel] = e.stat()
+    return files
+# -------------------------------------------------------------------------------
+def _verify(tasks,full,update,workers):
+    """Verify the output files of tasks against their manifests, given as (sponsor, project, package, taskname, output directory) tuples. The files are listed in parallel, then hashed in parallel, all tasks sharing the same pool of threads; hashlib releases the GIL while hashing, so that the threads hash in parallel. The files are read through the storage backend, and the recorded files not found in the output directory are looked up through it as well, e.g. the files evicted by a CachedBackend, which are still in its remote directory."""
+    import pandas as pd
+    t0 = time.perf_counter()
+    storage = getTaskStorage()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        scans = list(pool.map(lambda t: (_readManifest(_manifestPath(t[4],t[3])),
+                                         _scanTask(t[4],t[3])),tasks))
+        rows = []
+        jobs = []
+        changes = {(t[4],t[3]): [] for t in tasks}
+        for (t,(manifest,files)) in zip(tasks,scans):
+            recorded = manifest["files"]
+            for rel in sorted(set(recorded) | set(files)):
+                row = {"sponsor": t[0], "project": t[1], "package": t[2], "task": t[3],
+                       "path": rel, "size": None, "status": None}
+                rows.append(row)
+                path = os.path.join(t[4],*rel.split("/"))
+                st = files.get(rel)
+                if st is None:
+                    try:
+                        st = storage.stat(path)
+                    except FileNotFoundError:
+                        row["status"] = "missing"
+                        if update:
+                            changes.setdefault((t[4],t[3]),[]).append((rel,None))
+                        continue
+                row["size"] = st.st_size
+                e = recorded.get(rel)
+                if (not full and e is not None and e["sha256"] is not None and
+                    e["size"] == st.st_size and e["mtime"] == st.st_mtime_ns):
+                    row["status"] = "unchanged"
+                    continue
+                jobs.append((t,row,st,e,pool.submit(_hashFile,path,storage=storage)))
+        for (t,row,st,e,future) in jobs:
+            try:
+                digest = future.result()
+            except FileNotFoundError:
+                row["status"] = "missing"
+                if update:
+                    changes.setdefault((t[4],t[3]),[]).append((row["path"],None))
+                continue
+            if e is None:
+                row["status"] = "untracked"
+            elif e["sha256"] == digest:
+                row["status"] = "ok"
+            elif e["sha256"] is None and e["size"] == st.st_size and e["mtime"] == st.st_mtime_ns:
+                # The digest was not computed while writing the file.
+                row["status"] = "ok"
+            else:
+                row["status"] = "modified"
+            if row["status"] == "ok" or update:
+                changes.setdefault((t[4],t[3]),[]).append((row["path"],_entry(None,digest,st)))
+        _updateManifests(changes,compact=True)
+    report = pd.DataFrame(rows,columns=["sponsor","project","package","task","path","size","status"])
+    counts = report["status"].value_counts().to_dict()
+    _log.info(f"{len(tasks)} task(s), {len(report)} file(s) verified in {time.perf_counter() - t0:.3f}s: {counts}")
+    return report
+# -------------------------------------------------------------------------------
+def verifyTask(task, full=False, update=False, workers=8):
+    """Verify the files of the output directory of a task against its manifest. The manifest, stored beside the task file as '<task>_manifest.json', records the size, mtime and SHA-256 digest of each file written by the save methods. The files whose size and mtime did not change since they were recorded are not hashed again, unless the full parameter is set to True; the other files are hashed in a pool of threads. A file is 'unchanged' if it was not hashed, 'ok' if its digest matches the manifest, 'modified' if it does not, 'missing' if it was removed, and 'untracked' if it is not in the manifest. If the update parameter is set to True, the manifest is updated to the current files, accepting the modified, missing and untracked files. The saves append their records to a journal beside the manifest, '<task>_manifest.jsonl', which the verification compacts into the manifest; each process appends its records in batches, at the latest a second after a save, so that the saves of another process still running may be reported a second late; the digests not computed while writing, e.g. of the reports and tables written by path, are computed by the first verification, the files being 'ok' if their size and mtime did not change since they were recorded. The I/O sidecar, the result cache and the hidden temporary files are not tracked.
+
+    Attributes:
+    task (Task): The task.
+    full (bool): A flag to hash all the files.
+    update (bool): A flag to update the manifest to the current files.
+    workers (int): The maximum number of threads.
+
+    Returns:
+    DataFrame: The sponsor, project, package, task, relative path, size and status of each file.
+    """
+    _checkLocalStorage("The manifest")
+    data = task.getTaskPaths()["data"]
+    return _verify([(task.sponsor,task.project,task.package,task.task,data)],full,update,workers)
+# -------------------------------------------------------------------------------
+def verifyRepository(project=None, package=None, sponsor=None, full=False, update=False, workers=8, allSponsors=False):
+    """Verify the files of the output directories of the tasks in the repository against their manifests (see verifyTask). The tasks are listed from the task catalog (see listTasks): those of the sponsor set by setTaskSponsor by default, or of all sponsors if the allSponsors parameter is set to True. The files of all tasks are hashed in the same pool of threads.
+
+    Attributes:
+    project (str): The project of the tasks (optional).
+    package (str): The package of the tasks (optional).
+    sponsor (str): The sponsor of the tasks; getTaskSponsor() by default (optional).
+    full (bool): A flag to hash all the files.
+    update (bool): A flag to update the manifests to the current files.
+    workers (int): The maximum number of threads.
+    allSponsors (bool): A flag to verify the tasks of all sponsors.
+
+    Returns:
+    DataFrame: The sponsor, project, package, task, relative path, size and status of each file.
+    """
+    _checkLocalStorage("The manifest")
+    root = getTaskRoot()
+    tasks = listTasks(project, package, sponsor, allSponsors=allSponsors)
+    return _verify([(r.sponsor,r.project,r.package,r.task,
+                     os.path.join(root,r.sponsor,r.project,r.package,"output",r.task))
+                    for r in tasks.itertuples()],full,update,workers)
+# -------------------------------------------------------------------------------
@@ -0,0 +1,184 @@
+"""
+D4TAlinkPack
+
+D4TAlink single-file archives of the task outputs.
+"""
+
+__all__ = []
+
+import os
+import io
+import json
+import mmap
+import time
+import struct
+import shutil
+import zipfile
+import threading
+from .D4TAlinkStorage import _BufferReader
+
+# Member of a task archive holding the mtime and digest of the packed files.
+_PACK_INDEX = "pack.json"
+# Alignment of the stored members, so that memory-mapped buffers keep the
+# alignment of their container file.
+_PACK_ALIGN = 64
+# Compression of the archive members.
+_PACK_COMPRESSION = {None: zipfile.ZIP_STORED,
+                     "deflate": zipfile.ZIP_DEFLATED,
+                     "bz2": zipfile.ZIP_BZIP2,
+                     "xz": zipfile.ZIP_LZMA}
+# Extensions of the members always stored uncompressed: memory-mapped
+# containers, and formats compressed already.
+_PACK_STORED = (".pkb",".gz",".bz2",".xz",".zst",".lz4",".zip",".xlsx",".parquet")
+# Archives opened by the process, keyed by path, with the stat they were opened at.
+_D4TAlinkPacks = {}
+_D4TAlinkPacksLock = threading.Lock()
+
+# -------------------------------------------------------------------------------
+def _packDir(afn):
+    """Get the package directory of a task archive, the member names being relative to it."""
+    return os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(afn))))
+# -------------------------------------------------------------------------------
+def _alignExtra(offset,name,size):
+    """Get the extra field padding the local header of a stored member, so that its data starts at an aligned offset of the archive."""
+    length = 30 + len(name.encode("utf-8")) + 4
+    if size * 1.05 > zipfile.ZIP64_LIMIT:
+        length += 20
+    pad = -(offset + length) % _PACK_ALIGN
+    return struct.pack("<HH",0xD935,pad) + b"\0" * pad
+# -------------------------------------------------------------------------------
+def _zipDate(t):
+    """Get the ZIP date of a timestamp; the ZIP format cannot store dates before 1980."""
+    return max(time.localtime(t)[:6],(1980,1,1,0,0,0))
+# -------------------------------------------------------------------------------
+def _writePack(fn,files,index,compression=None,previous=None,mtime=None):
+    """Write a task archive: the files are given as (file path, member name) pairs, and the members of a previous archive not in the files are carried over. The index is written as the last member. The mtime of the archive is set to the given mtime, so that packing does not make the task look newer than its outputs."""
+    if compression not in _PACK_COMPRESSION:
+        raise ValueError(f"Archive compression '{compression}' not recognized.")
+    names = {name for (_,name) in files}
+    with zipfile.ZipFile(fn,"w",allowZip64=True) as zf:
+        def add(name,size,date,copy):
+            zi = zipfile.ZipInfo(name,date)
+            zi.file_size = size
+            zi.compress_type = _PACK_COMPRESSION[compression]
+            if compression is None or name.endswith(_PACK_STORED):
+                zi.compress_type = zipfile.ZIP_STORED
+                zi.extra = _alignExtra(zf.fp.tell(),name,size)
+            with zf.open(zi,"w",force_zip64=size * 1.05 > zipfile.ZIP64_LIMIT) as dst:
+                copy(dst)
+        for (path,name) in files:
+            st = os.stat(path)
+            def copy(dst):
+                with open(path,"rb") as src:
+                    shutil.copyfileobj(src,dst,1 << 20)
+            add(name,st.st_size,_zipDate(st.st_mtime),copy)
+        if previous is not None:
+            for zi in previous.infos():
+                if zi.filename not in names:
+                    def copy(dst):
+                        with previous.open(zi) as src:
+                            shutil.copyfileobj(src,dst,1 << 20)
+                    add(zi.filename,zi.file_size,zi.date_time,copy)
+        zf.writestr(_PACK_INDEX,json.dumps(index))
+    if mtime is not None:
+        os.utime(fn,ns=(mtime,mtime))
+# -------------------------------------------------------------------------------
+class _Pack:
+    """Task archive opened for reading, providing the read methods of the storage backends for its members. The central directory is read once; stored members are read from a memory map of the archive, without copy, and compressed members through the ZIP file."""
+    # -------------------------------------
+    def __init__(self,fn):
+        self.fn = fn
+        self.dir = _packDir(fn)
+        self._zip = zipfile.ZipFile(fn,"r")
+        with open(fn,"rb") as fp:
+            self._mmap = mmap.mmap(fp.fileno(),0,access=mmap.ACCESS_READ)
+        self._offsets = {}
+        self.index = json.loads(self._zip.read(_PACK_INDEX))
+    # -------------------------------------
+    def name(self,fn):
+        """Get the member name of a file path, or None if the file is not in the package directory."""
+        rel = os.path.relpath(os.path.abspath(fn),os.path.abspath(self.dir))
+        if rel.startswith(".."):
+            return None
+        return rel.replace(os.sep,"/")
+    # -------------------------------------
+    def info(self,fn):
+        """Get the ZIP information of the member of a file path, or None if it is not packed."""
+        name = self.name(fn)
+        if name is None or name == _PACK_INDEX:
+            return None
+        try:
+            return self._zip.getinfo(name)
+        except KeyError:
+            return None
+    # -------------------------------------
+    def infos(self):
+        """Get the ZIP information of the packed files."""
+        return [zi for zi in self._zip.infolist() if zi.filename != _PACK_INDEX]
+    # -------------------------------------
+    def offset(self,zi):
+        """Get the offset of the data of a stored member in the archive, from its local header."""
+        if zi.filename not in self._offsets:
+            (n,m) = struct.unpack("<HH",self._mmap[zi.header_offset+26:zi.header_offset+30])
+            self._offsets[zi.filename] = zi.header_offset + 30 + n + m
+        return self._offsets[zi.filename]
+    # -------------------------------------
+    def _member(self,fn):
+        """Get the ZIP information of a member, given as a file path or as ZIP information."""
+        zi = fn if isinstance(fn, zipfile.ZipInfo) else self.info(fn)
+        if zi is None:
+            raise FileNotFoundError(f"File '{fn}' is not in the archive '{self.fn}'.")
+        return zi
+    def exists(self,fn):
+        """Check if a file path is packed."""
+        return self.info(fn) is not None
+    def localPath(self,fn):
+        """The members have no local file path."""
+        return None
+    def buffer(self,fn):
+        """Get the content of a member: a read-only view of the memory map for a stored member, or the decompressed bytes."""
+        zi = self._member(fn)
+        if zi.compress_type == zipfile.ZIP_STORED:
+            o = self.offset(zi)
+            return memoryview(self._mmap)[o:o+zi.file_size]
+        return self._zip.read(zi)
+    # -------------------------------------
+    def open(self,fn):
+        """Open a member as a binary file object, seeking straight to its data."""
+        zi = self._member(fn)
+        if zi.compress_type == zipfile.ZIP_STORED:
+            return io.BufferedReader(_BufferReader(self.buffer(zi)))
+        return self._zip.open(zi)
+    # -------------------------------------
+    def close(self):
+        """Close the archive; the views of the memory map still in use keep it open."""
+        self._zip.close()
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass
+def _openPack(fn):
+    """Get the archive of a file path opened for reading, or None if it does not exist. The archives are kept open by the process, and reopened when they change."""
+    try:
+        st = os.stat(fn)
+    except FileNotFoundError:
+        _closePack(fn)
+        return None
+    stamp = (st.st_ino,st.st_size,st.st_mtime_ns)
+    with _D4TAlinkPacksLock:
+        entry = _D4TAlinkPacks.get(fn)
+        if entry is not None and entry[0] == stamp:
+            return entry[1]
+        pack = _Pack(fn)
+        _D4TAlinkPacks[fn] = (stamp,pack)
+    if entry is not None:
+        entry[1].close()
+    return pack
+# -------------------------------------------------------------------------------
+def _closePack(fn):
+    """Close the archive of a file path, if it is open."""
+    with _D4TAlinkPacksLock:
+        entry = _D4TAlinkPacks.pop(fn,None)
+    if entry is not None:
+        entry[1].close()
+# -------------------------------------------------------------------------------
@@ -9,9 +9,24 @@ __all__ = ["setTaskRoot",
            "setTaskSponsor",
            "getTaskSponsor",
            "setTaskAuthor",
-           "getTaskAuthor"]
+           "getTaskAuthor",
+           "setTaskFsync",
+           "getTaskFsync",
+           "setTaskStorage",
+           "getTaskStorage",
+           "config"]
 
 import os
+import getpass
+import contextlib
+import contextvars
+
+# Configuration of the current thread or asyncio task, overriding the globals.
+_D4TAlinkConfig = contextvars.ContextVar("D4TAlinkConfig",default={})
+# Root directories known to exist.
+_D4TAlinkRoots = set()
+# Default storage backend, created on first use.
+_D4TAlinkLocal = None
 
 # -------------------------------------------------------------------------------
 def D4TAlinkInit():
@@ -19,10 +34,33 @@ def D4TAlinkInit():
     if not "_D4TAlinkPar" in globals():
         global _D4TAlinkPar
         globals()["_D4TAlinkPar"] = {}
-        globals()["_D4TAlinkPar"]["author"] = os.getlogin()
 # -------------------------------------------------------------------------------
 D4TAlinkInit()
 # -------------------------------------------------------------------------------
+def _getPar(key):
+    """Get a parameter from the configuration of the current context, or else from the globals."""
+    v = _D4TAlinkConfig.get().get(key)
+    if v is None:
+        v = globals()["_D4TAlinkPar"].get(key)
+    return v
+# -------------------------------------------------------------------------------
+def _checkRoot(root, dirCreate=False, storage=None):
+    """Check that a root directory exists, creating it if requested, unless the storage backend has no local files. The roots found to exist are remembered, so that they are checked once per process."""
+    if root in _D4TAlinkRoots:
+        return root
+    if not (storage or getTaskStorage()).local:
+        return root
+    if dirCreate:
+        os.makedirs(root, exist_ok = True)
+    if not os.path.exists(root):
+        raise FileNotFoundError(f"Root directory '{root}' does not exist.")
+    _D4TAlinkRoots.add(root)
+    return root
+# -------------------------------------------------------------------------------
+def _clearRootCache():
+    """Forget the root directories known to exist."""
+    _D4TAlinkRoots.clear()
+# -------------------------------------------------------------------------------
 
 # -------------------------------------------------------------------------------
 def setTaskRoot(root, dirCreate = False):
@@ -34,23 +72,26 @@ def setTaskRoot(root, dirCreate = False):
     Returns:
     str: The root directory for the tasks.
     """
-    if dirCreate:
-        os.makedirs(root, exist_ok = True)
-    if not os.path.exists(root):
-        raise FileNotFoundError(f"Root directory '{root}' does not exist.")
+    _D4TAlinkRoots.discard(root)
+    _checkRoot(root, dirCreate)
     D4TAlinkInit()
     globals()["_D4TAlinkPar"]["root"] = root
     return globals()["_D4TAlinkPar"]["root"]
 # -------------------------------------------------------------------------------
-def getTaskRoot():
-    """Get the root directory for the tasks. This is the directory where the tasks are stored. The root directory should contain subdirectories for each sponsor, project, and package. The task files are stored in the package directory. The root directory should be a string with the full path to the root directory. The function returns the root directory.
+def getTaskRoot(check=True):
+    """Get the root directory for the tasks. This is the directory where the tasks are stored. The root directory should contain subdirectories for each sponsor, project, and package. The task files are stored in the package directory. The root directory should be a string with the full path to the root directory. The root directory of the current config block is returned if there is one, and the global root directory otherwise. The existence of the root directory is checked once per process. The function returns the root directory.
     
+    Attributes:
+    check (bool): A flag to check that the root directory exists.
+
     Returns:
     str: The root directory for the tasks.
     """
-    v = globals()["_D4TAlinkPar"]["root"]
-    if not os.path.exists(v):
-        raise FileNotFoundError(f"Root directory '{v}' does not exist.")
+    v = _getPar("root")
+    if v is None:
+        raise ValueError("Root directory is not defined.")
+    if check:
+        _checkRoot(v)
     return v
 # -------------------------------------------------------------------------------
 
@@ -74,7 +115,7 @@ def getTaskSponsor():
     Returns:
     str: The sponsor for the tasks.
     """
-    v = globals()["_D4TAlinkPar"]["sponsor"]
+    v = _getPar("sponsor")
     if v is None:
         raise ValueError("Sponsor is not defined.")
     return v
@@ -94,15 +135,119 @@ def setTaskAuthor(author):
     globals()["_D4TAlinkPar"]["author"] = author
     return globals()["_D4TAlinkPar"]["author"]
 # -------------------------------------------------------------------------------
+def _detectAuthor():
+    """Detect the login name of the user running the process, from the controlling terminal or, without one (e.g. in cron jobs and containers), from the environment and the password database."""
+    try:
+        return os.getlogin()
+    except OSError:
+        pass
+    try:
+        return getpass.getuser()
+    except (OSError, KeyError):
+        return None
+# -------------------------------------------------------------------------------
 def getTaskAuthor():
-    """Get the author for the tasks. The author is the statistician responsible for the tasks. The author should be a string with the name of the author. The function returns the author.
+    """Get the author for the tasks. The author is the statistician responsible for the tasks. The author should be a string with the name of the author. If no author was set, the login name of the user is detected on first use and kept. The function returns the author.
     
     Returns:
     str: The author for the tasks.
     """
-    v = globals()["_D4TAlinkPar"]["author"]
+    v = _D4TAlinkConfig.get().get("author")
+    if v is None:
+        D4TAlinkInit()
+        if "author" not in globals()["_D4TAlinkPar"]:
+            globals()["_D4TAlinkPar"]["author"] = _detectAuthor()
+        v = globals()["_D4TAlinkPar"]["author"]
     if v is None:
         raise ValueError("Author is not defined.")
     return v
 # -------------------------------------------------------------------------------
 
+# -------------------------------------------------------------------------------
+def setTaskFsync(fsync):
+    """Set the flag to flush the task files to disk when they are written. The files are always written to a temporary file renamed to the final file name, so that a reader never sees a partial file; with this flag, the temporary file and its directory are also flushed with fsync, so that the file survives a crash of the machine, at the cost of a slower write. The function returns the flag.
+    
+    Attributes:
+    fsync (bool): The flag to flush the task files to disk.
+    
+    Returns:
+    bool: The flag to flush the task files to disk.
+    """
+    D4TAlinkInit()
+    globals()["_D4TAlinkPar"]["fsync"] = bool(fsync)
+    return globals()["_D4TAlinkPar"]["fsync"]
+# -------------------------------------------------------------------------------
+def getTaskFsync():
+    """Get the flag to flush the task files to disk when they are written. The flag is not set by default.
+    
+    Returns:
+    bool: The flag to flush the task files to disk.
+    """
+    v = _getPar("fsync")
+    return False if v is None else v
+# -------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------
+def setTaskStorage(storage):
+    """Set the storage backend of the task files: the task file, binary objects, tables and reports are read and written through it, with the file paths of the task root. The backends are LocalBackend, the default, MemoryBackend, holding the files in memory, and CachedBackend, caching the files of a slow remote directory in a local directory; see StorageBackend. The storage backend should be set before the root directory, which does not need to exist for a backend without local files. The function returns the storage backend.
+    
+    Attributes:
+    storage (StorageBackend): The storage backend, or None for the default backend.
+    
+    Returns:
+    StorageBackend: The storage backend.
+    """
+    D4TAlinkInit()
+    globals()["_D4TAlinkPar"]["storage"] = storage
+    return getTaskStorage()
+# -------------------------------------------------------------------------------
+def getTaskStorage():
+    """Get the storage backend of the task files. The storage backend of the current config block is returned if there is one, the global storage backend otherwise, and a LocalBackend by default.
+    
+    Returns:
+    StorageBackend: The storage backend.
+    """
+    v = _getPar("storage")
+    if v is None:
+        global _D4TAlinkLocal
+        if _D4TAlinkLocal is None:
+            from .D4TAlinkStorage import LocalBackend
+            _D4TAlinkLocal = LocalBackend()
+        v = _D4TAlinkLocal
+    return v
+# -------------------------------------------------------------------------------
+def _checkLocalStorage(feature):
+    """Check that the storage backend has local files, which a feature working on the task directories requires."""
+    if not getTaskStorage().local:
+        raise ValueError(f"{feature} requires a storage backend of local files.")
+# -------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------
+@contextlib.contextmanager
+def config(root=None, sponsor=None, author=None, fsync=None, dirCreate=False, storage=None):
+    """Set the root directory, sponsor, author, fsync flag and storage backend for the tasks within a with block, in the current thread or asyncio task only. The parameters not given keep their value from the enclosing config block, or else from the globals set by setTaskRoot, setTaskSponsor, setTaskAuthor, setTaskFsync and setTaskStorage. Since the configuration is held in a context variable, concurrent threads and asyncio tasks can each work in their own root directory or for their own sponsor without interfering; the asynchronous task methods, loadTasks and the queued writes run with the configuration of their caller.
+    
+    Attributes:
+    root (str): The root directory for the tasks (optional).
+    sponsor (str): The sponsor for the tasks (optional).
+    author (str): The author for the tasks (optional).
+    fsync (bool): The flag to flush the task files to disk (optional).
+    dirCreate (bool): A flag to create the root directory.
+    storage (StorageBackend): The storage backend of the task files (optional).
+    
+    Returns:
+    dict: The configuration of the with block.
+    """
+    if root is not None:
+        _checkRoot(root, dirCreate, storage)
+    cfg = dict(_D4TAlinkConfig.get())
+    for (k,v) in {"root": root, "sponsor": sponsor, "author": author, "fsync": fsync,
+                  "storage": storage}.items():
+        if v is not None:
+            cfg[k] = v
+    token = _D4TAlinkConfig.set(cfg)
+    try:
+        yield dict(cfg)
+    finally:
+        _D4TAlinkConfig.reset(token)
+# -------------------------------------------------------------------------------
@@ -0,0 +1,249 @@
+"""
+D4TAlinkScheduler
+
+D4TAlink dependency-aware task scheduler.
+"""
+
+__all__ = ["taskGraph",
+           "runTasks"]
+
+import os
+import re
+import time
+import logging
+from collections import deque
+from concurrent.futures import Future, FIRST_COMPLETED, wait
+from .D4TAlinkPar import *
+from .D4TAlinkTask import loadTask, _taskPaths
+from .D4TAlinkCatalog import listTasks
+from .D4TAlinkCache import _CACHE_SUBDIR
+from .D4TAlinkStorage import LocalBackend
+from .D4TAlinkManifest import _flushJournals
+
+_log = logging.getLogger("D4TAlink")
+
+# -------------------------------------------------------------------------------
+def _parseDependencies(dependencies,project,package):
+    """Parse the dependencies of a task, given as a list or as a string separated by new lines, commas or semicolons. Each dependency is 'taskname' for a task of the same package, 'package/taskname' for a task of the same project, or 'project/package/taskname'."""
+    if not isinstance(dependencies, (str, list, tuple)):
+        return []
+    if isinstance(dependencies, str):
+        dependencies = re.split(r"[\n,;]",dependencies)
+    keys = []
+    for d in dependencies:
+        d = d.strip()
+        if not d:
+            continue
+        parts = [p.strip() for p in d.split("/")]
+        if len(parts) > 3 or not all(parts):
+            raise ValueError(f"Dependency '{d}' must be 'taskname', 'package/taskname' or 'project/package/taskname'.")
+        keys.append(tuple([project,package][:3 - len(parts)] + parts))
+    return keys
+# -------------------------------------------------------------------------------
+def taskGraph(project=None, package=None, sponsor=None, refresh=True):
+    """Get the dependency graph of the tasks of a project or package. The tasks are listed from the task catalog (see listTasks), and their dependencies are parsed from their 'dependencies' attribute: a list, or a string separated by new lines, commas or semicolons, of 'taskname' for a task of the same package, 'package/taskname' for a task of the same project, or 'project/package/taskname'. The dependencies outside of the project or package are part of the graph, with the dependencies they declare themselves if they exist.
+
+    Attributes:
+    project (str): The project of the tasks (optional).
+    package (str): The package of the tasks (optional).
+    sponsor (str): The sponsor of the tasks (optional).
+    refresh (bool): A flag to refresh the catalog before listing the tasks.
+
+    Returns:
+    dict: The dependencies of each task, keyed by (project, package, taskname).
+    """
+    if sponsor is None:
+        sponsor = getTaskSponsor()
+    graph = {}
+    tasks = listTasks(project, package, sponsor, refresh=refresh)
+    for row in tasks.itertuples():
+        graph[(row.project,row.package,row.task)] = _parseDependencies(row.dependencies,row.project,row.package)
+    external = deque(d for deps in list(graph.values()) for d in deps if d not in graph)
+    while external:
+        key = external.popleft()
+        if key in graph:
+            continue
+        ta = loadTask(*key,sponsor=sponsor,quiet=True,readOnly=True)
+        graph[key] = [] if ta is None else _parseDependencies(ta.dependencies,key[0],key[1])
+        external.extend(d for d in graph[key] if d not in graph)
+    return graph
+# -------------------------------------------------------------------------------
+def _topologicalOrder(graph):
+    """Sort the tasks of a dependency graph so that each task follows its dependencies."""
+    remaining = {k: set(deps) for (k,deps) in graph.items()}
+    dependents = {k: [] for k in graph}
+    for (k,deps) in graph.items():
+        for d in deps:
+            dependents[d].append(k)
+    ready = deque(k for (k,deps) in remaining.items() if not deps)
+    order = []
+    while ready:
+        k = ready.popleft()
+        order.append(k)
+        for x in dependents[k]:
+            remaining[x].discard(k)
+            if not remaining[x]:
+                ready.append(x)
+    if len(order) < len(graph):
+        cycle = sorted("/".join(k) for k in graph if k not in order)
+        raise ValueError(f"The task dependencies have a cycle among: {', '.join(cycle)}")
+    return order
+# -------------------------------------------------------------------------------
+def _outputTime(root,sponsor,key):
+    """Get the newest mtime of the output files of a task, except its task file, manifest, I/O sidecar and result cache."""
+    (project,package,taskname) = key
+    paths = _taskPaths(root,sponsor,project,package,taskname)
+    skipFiles = {f"{taskname}_task.json", f"{taskname}_io.jsonl", f"{taskname}_manifest.json",
+                 f"{taskname}_manifest.jsonl"}
+    skipDir = os.path.join(paths["binary"],_CACHE_SUBDIR)
+    times = []
+    stack = [paths["data"]]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        with it:
+            for e in it:
+                if e.is_dir(follow_symlinks=False):
+                    if e.path != skipDir:
+                        stack.append(e.path)
+                elif e.name not in skipFiles and not e.name.startswith(".") and not e.name.endswith(".tmp"):
+                    times.append(e.stat().st_mtime_ns)
+    return max(times) if times else None
+# -------------------------------------------------------------------------------
+def _runTaskJob(root,sponsor,author,fsync,storage,key,function):
+    """Run the function of a task with the configuration of the caller of runTasks (see config), in the calling process, a worker thread or a worker process, since worker processes may not inherit it. The configuration only holds for the job: the globals of the process are left untouched. The manifest records of the job are appended before it returns, since a worker process exits without running its exit handlers."""
+    with config(root=root,sponsor=sponsor,author=author,fsync=fsync,storage=storage):
+        task = loadTask(*key,sponsor=sponsor)
+        t0 = time.time()
+        try:
+            function(task)
+        finally:
+            _flushJournals()
+        return (t0,time.time())
+# -------------------------------------------------------------------------------
+def _resolveKey(name,graph,project,package):
+    """Resolve a task given as 'taskname', 'package/taskname', 'project/package/taskname' or a tuple to its key in a dependency graph."""
+    parts = tuple(name.split("/")) if isinstance(name, str) else tuple(name)
+    if len(parts) == 3:
+        if parts not in graph:
+            raise ValueError(f"Task '{'/'.join(parts)}' is not found.")
+        return parts
+    matches = [k for k in graph if k[3 - len(parts):] == parts and
+               (project is None or k[0] == project) and (package is None or k[1] == package)]
+    if len(matches) != 1:
+        raise ValueError(f"Task '{'/'.join(parts)}' is {'ambiguous' if matches else 'not found'}; use 'project/package/taskname'.")
+    return matches[0]
+# -------------------------------------------------------------------------------
+def runTasks(functions, project=None, package=None, sponsor=None, workers=None, force=False, quiet=False):
+    """Run the functions of tasks in the order of their dependencies (see taskGraph). Each function is called with its task object, once the functions of the tasks it depends on have completed, in a pool of processes: independent tasks run in parallel, up to the number of workers. A task is skipped if it was run after its inputs last changed, i.e. if its newest output file is newer than all the output files of its dependencies, and none of its dependencies was run, unless the force parameter is set to True; a task without output files is always run. If a function fails, the tasks depending on it are not run, and the other tasks are. With several workers, the functions must be picklable, i.e. defined at the top level of a module. The functions run with the root, sponsor, author, fsync flag and storage backend of the caller (see config); with a storage backend other than LocalBackend, which worker processes cannot share, they run in a pool of threads instead. The function returns the status and timings of each task; the tasks on the critical path, the longest chain of dependent tasks, are flagged, since the run cannot be faster than this chain.
+
+    Attributes:
+    functions (dict): The function of each task, keyed by 'taskname', 'package/taskname', 'project/package/taskname' or (project, package, taskname).
+    project (str): The project of the tasks (optional).
+    package (str): The package of the tasks (optional).
+    sponsor (str): The sponsor of the tasks (optional).
+    workers (int): The maximum number of processes; the number of CPUs by default, and no process pool if 1 (optional).
+    force (bool): A flag to run the tasks even if they are up to date.
+    quiet (bool): A flag to not log the status of the tasks.
+
+    Returns:
+    DataFrame: The project, package, task, status ('run', 'skipped', 'failed' or 'blocked'), start and end in seconds since the start of the run, duration in seconds, critical path flag and error of each task.
+    """
+    import pandas as pd
+    if sponsor is None:
+        sponsor = getTaskSponsor()
+    root = getTaskRoot()
+    author = getTaskAuthor()
+    fsync = getTaskFsync()
+    storage = getTaskStorage()
+    graph = taskGraph(project,package,sponsor)
+    jobs = {_resolveKey(k,graph,project,package): f for (k,f) in functions.items()}
+    order = [k for k in _topologicalOrder(graph) if k in jobs]
+    remaining = {k: {d for d in graph[k] if d in jobs} for k in order}
+    dependents = {k: [x for x in order if k in remaining[x]] for k in order}
+    status = {}
+    rows = {}
+    ready = deque(k for k in order if not remaining[k])
+    futures = {}
+    t0 = time.time()
+    pool = None
+    # The storage backend passed to the jobs; the worker processes use their own.
+    jobStorage = storage
+    if workers != 1 and not isinstance(storage, LocalBackend):
+        from concurrent.futures import ThreadPoolExecutor
+        pool = ThreadPoolExecutor(max_workers=workers)
+    elif workers != 1:
+        from concurrent.futures import ProcessPoolExecutor
+        pool = ProcessPoolExecutor(max_workers=workers)
+        jobStorage = None
+    def done(k,state,start=None,end=None,error=None):
+        status[k] = state
+        rows[k] = {"project": k[0], "package": k[1], "task": k[2], "status": state,
+                   "start": None if start is None else start - t0,
+                   "end": None if end is None else end - t0,
+                   "seconds": 0.0 if start is None else end - start, "error": error}
+        if not quiet:
+            if error is None:
+                _log.info(f"{'/'.join(k)}: {state} in {rows[k]['seconds']:.3f}s")
+            else:
+                _log.error(f"{'/'.join(k)}: {state}: {error}")
+        for x in dependents[k]:
+            remaining[x].discard(k)
+            if not remaining[x]:
+                ready.append(x)
+    try:
+        while ready or futures:
+            while ready:
+                k = ready.popleft()
+                deps = [status[d] for d in graph[k] if d in jobs]
+                if any(s in ("failed","blocked") for s in deps):
+                    done(k,"blocked")
+                    continue
+                if not force and "run" not in deps:
+                    output = _outputTime(root,sponsor,k)
+                    inputs = [_outputTime(root,sponsor,d) for d in graph[k]]
+                    if output is not None and all(i is None or i < output for i in inputs):
+                        done(k,"skipped")
+                        continue
+                if pool is None:
+                    future = Future()
+                    try:
+                        future.set_result(_runTaskJob(root,sponsor,author,fsync,storage,k,jobs[k]))
+                    except Exception as e:
+                        future.set_exception(e)
+                else:
+                    future = pool.submit(_runTaskJob,root,sponsor,author,fsync,jobStorage,k,jobs[k])
+                futures[future] = k
+            if futures:
+                (finished,_) = wait(futures,return_when=FIRST_COMPLETED)
+                for future in finished:
+                    k = futures.pop(future)
+                    try:
+                        (start,end) = future.result()
+                        done(k,"run",start,end)
+                    except Exception as e:
+                        done(k,"failed",error=repr(e))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    finish = {}
+    previous = {}
+    for k in order:
+        deps = [d for d in graph[k] if d in jobs]
+        previous[k] = max(deps,key=lambda d: finish[d],default=None)
+        finish[k] = rows[k]["seconds"] + (finish[previous[k]] if previous[k] is not None else 0.0)
+    critical = []
+    k = max(order,key=lambda k: finish[k],default=None)
+    while k is not None:
+        critical.append(k)
+        k = previous[k]
+    report = pd.DataFrame([rows[k] for k in order],
+                          columns=["project","package","task","status","start","end","seconds","error"])
+    report.insert(7,"critical",[k in critical for k in order])
+    if not quiet and order:
+        _log.info(f"{len(order)} task(s) in {time.time() - t0:.3f}s; critical path "
+                  f"{' > '.join(k[2] for k in reversed(critical))} in {finish[critical[0]]:.3f}s")
+    return report
+# -------------------------------------------------------------------------------
@@ -0,0 +1,615 @@
+"""
+D4TAlinkStorage
+
+D4TAlink storage backends of the task files.
+"""
+
+__all__ = ["StorageBackend",
+           "LocalBackend",
+           "MemoryBackend",
+           "CachedBackend"]
+
+import os
+import io
+import abc
+import mmap
+import time
+import uuid
+import errno
+import shutil
+import logging
+import tempfile
+import threading
+from types import SimpleNamespace
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from .D4TAlinkPar import *
+from .D4TAlinkLock import _atomicWrite
+
+_log = logging.getLogger("D4TAlink")
+
+# -------------------------------------------------------------------------------
+def _notFound(fn):
+    return FileNotFoundError(errno.ENOENT,f"File '{fn}' does not exist.",fn)
+# -------------------------------------------------------------------------------
+def _mapFile(fn):
+    """Get the content of a file as a read-only view of its memory map."""
+    with open(fn,"rb") as fp:
+        if os.fstat(fp.fileno()).st_size == 0:
+            return memoryview(b"")
+        return memoryview(mmap.mmap(fp.fileno(),0,access=mmap.ACCESS_READ))
+# -------------------------------------------------------------------------------
+class _BufferReader(io.RawIOBase):
+    """Raw reader over a bytes-like object, e.g. a view of a memory map, to be wrapped in a BufferedReader."""
+    # -------------------------------------
+    def __init__(self,mv):
+        self._mv = memoryview(mv)
+        self._pos = 0
+    def readable(self):
+        return True
+    def seekable(self):
+        return True
+    def readinto(self,b):
+        n = max(0,min(len(b),len(self._mv) - self._pos))
+        b[:n] = self._mv[self._pos:self._pos+n]
+        self._pos += n
+        return n
+    def seek(self,offset,whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._mv)}[whence]
+        self._pos = max(0,base + offset)
+        return self._pos
+    def tell(self):
+        return self._pos
+    def close(self):
+        self._mv = memoryview(b"")
+        super().close()
+# -------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------
+class StorageBackend(abc.ABC):
+    """Abstract base class of the storage backends of the task files. The task file, binary objects, tables and reports saved and read by the tasks go through the backend set by setTaskStorage or config, with the file paths of the task root; the other backends derive from this class, and implement its abstract methods: exists, stat, open, write and remove. A backend whose files are local files of the task root, such as LocalBackend and CachedBackend, sets the local attribute, which the features working on the local files require: the task catalog, the manifest, the blob store, the result cache, the partitioned datasets and the task archives.
+
+    Methods:
+    exists(fn): Check if a file exists.
+    stat(fn): Get the size and mtime of a file.
+    open(fn): Open a file for reading, as a binary file object.
+    buffer(fn): Get the content of a file, as a bytes-like object.
+    localPath(fn): Get a local file path for a file, or None.
+    write(fn,write,fsync=None): Write a file atomically with a write function.
+    commit(fn,fsync=None): Take over a file written to its local file path.
+    remove(fn): Remove a file.
+    makedirs(path): Create a directory.
+    flush(): Complete the pending writes.
+    close(): Complete the pending writes and release the resources of the backend.
+    """
+    local = False
+    # -------------------------------------
+    @abc.abstractmethod
+    def exists(self,fn):
+        """Check if a file exists.
+
+        Attributes:
+        fn (str): The file path.
+
+        Returns:
+        bool: True if the file exists.
+        """
+    @abc.abstractmethod
+    def stat(self,fn):
+        """Get the size and mtime of a file; a FileNotFoundError is raised if the file does not exist.
+
+        Attributes:
+        fn (str): The file path.
+
+        Returns:
+        stat_result: The size and mtime in ns, as the st_size and st_mtime_ns attributes.
+        """
+    @abc.abstractmethod
+    def open(self,fn):
+        """Open a file for reading, as a binary file object; a FileNotFoundError is raised if the file does not exist.
+
+        Attributes:
+        fn (str): The file path.
+
+        Returns:
+        file: The binary file object.
+        """
+    def buffer(self,fn):
+        """Get the content of a file, as a bytes-like object, e.g. a read-only view of a memory map.
+
+        Attributes:
+        fn (str): The file path.
+
+        Returns:
+        bytes: The content of the file.
+        """
+        with self.open(fn) as fp:
+            return fp.read()
+    def localPath(self,fn):
+        """Get a local file path holding the content of a file, e.g. for the readers needing a file path; None if the backend has no local files.
+
+        Attributes:
+        fn (str): The file path.
+
+        Returns:
+        str: The local file path.
+        """
+        return None
+    @abc.abstractmethod
+    def write(self,fn,write,fsync=None):
+        """Write a file atomically: the write function writes the content to a given local file path, and the file is replaced by the content once it is complete.
+
+        Attributes:
+        fn (str): The file path.
+        write (function): The function writing the content to a local file path.
+        fsync (bool): A flag to flush the file to disk; getTaskFsync by default (optional).
+
+        Returns:
+        str: The file path.
+        """
+    def commit(self,fn,fsync=None):
+        """Take over a file written to its local file path outside of the write method, e.g. by the blob store or by another process.
+
+        Attributes:
+        fn (str): The file path.
+        fsync (bool): A flag to flush the file to disk; getTaskFsync by default (optional).
+        """
+        pass
+    @abc.abstractmethod
+    def remove(self,fn):
+        """Remove a file; a FileNotFoundError is raised if the file does not exist.
+
+        Attributes:
+        fn (str): The file path.
+        """
+    def makedirs(self,path):
+        """Create a directory and its parents, if the backend has directories.
+
+        Attributes:
+        path (str): The directory path.
+        """
+        pass
+    def flush(self):
+        """Complete the pending writes."""
+        pass
+    def close(self):
+        """Complete the pending writes and release the resources of the backend."""
+        self.flush()
+    def __enter__(self):
+        return self
+    def __exit__(self,*args):
+        self.close()
+# -------------------------------------------------------------------------------
+class LocalBackend(StorageBackend):
+    """Storage backend of the files of the local filesystem, or of any filesystem mounted locally. This is the default backend: the files are read and written in place, and the binary files are memory-mapped."""
+    local = True
+    # -------------------------------------
+    def exists(self,fn):
+        return os.path.exists(fn)
+    def stat(self,fn):
+        return os.stat(fn)
+    def open(self,fn):
+        return open(fn,"rb")
+    def buffer(self,fn):
+        return _mapFile(fn)
+    def localPath(self,fn):
+        return fn
+    def write(self,fn,write,fsync=None):
+        return _atomicWrite(fn,write,fsync)
+    def remove(self,fn):
+        os.remove(fn)
+    def makedirs(self,path):
+        os.makedirs(path,exist_ok=True)
+# -------------------------------------------------------------------------------
+class MemoryBackend(StorageBackend):
+    """Storage backend holding the files in memory, e.g. for fast tests and ephemeral pipelines. The task root is then only the prefix of the file paths, and does not need to exist; the files are lost with the backend. The files are written to a temporary staging file first, since the writers of some formats need a file path, and are read from memory without copy. The features working on the local files (see StorageBackend) are not available, and the file locks only exclude the threads of the process.
+
+    Methods:
+    files(): List the paths of the files held.
+    """
+    # -------------------------------------
+    def __init__(self):
+        self._files = {}
+        self._mtimes = {}
+        self._lock = threading.Lock()
+        self._staging = None
+    # -------------------------------------
+    def _key(self,fn):
+        return os.path.abspath(fn)
+    def exists(self,fn):
+        return self._key(fn) in self._files
+    def stat(self,fn):
+        data = self.buffer(fn)
+        return SimpleNamespace(st_size=data.nbytes,st_mtime_ns=self._mtimes[self._key(fn)])
+    def open(self,fn):
+        return io.BufferedReader(_BufferReader(self.buffer(fn)))
+    def buffer(self,fn):
+        try:
+            return memoryview(self._files[self._key(fn)])
+        except KeyError:
+            raise _notFound(fn) from None
+    def write(self,fn,write,fsync=None):
+        with self._lock:
+            if self._staging is None:
+                self._staging = tempfile.mkdtemp(prefix="d4talink-")
+        tfn = os.path.join(self._staging,f"{uuid.uuid4().hex[:12]}.{os.path.basename(fn)}")
+        try:
+            write(tfn)
+            with open(tfn,"rb") as fp:
+                data = fp.read()
+        finally:
+            try:
+                os.remove(tfn)
+            except FileNotFoundError:
+                pass
+        self._files[self._key(fn)] = data
+        self._mtimes[self._key(fn)] = time.time_ns()
+        return fn
+    def remove(self,fn):
+        if self._files.pop(self._key(fn),None) is None:
+            raise _notFound(fn)
+        self._mtimes.pop(self._key(fn),None)
+    # -------------------------------------
+    def files(self):
+        """List the paths of the files held.
+
+        Returns:
+        list: The file paths.
+        """
+        return sorted(self._files)
+    def close(self):
+        with self._lock:
+            if self._staging is not None:
+                shutil.rmtree(self._staging,ignore_errors=True)
+                self._staging = None
+# -------------------------------------------------------------------------------
+class CachedBackend(StorageBackend):
+    """Storage backend caching the files of a slow remote directory, e.g. a shared network mount, in a local cache directory, e.g. on a local SSD, which is used as the task root. The remote directory holds the canonical copy of the files, with the layout of the task root. The files written are written to the cache directory, then written back to the remote directory in the background by a pool of threads (write-back); flush waits for the pending write-backs and raises the first error. The files read are served from the cache directory, and fetched from the remote directory on a miss: a fetch reads blocks of blockSize bytes, with up to readAhead blocks read ahead in parallel, through a pool of at most maxHandles open remote files reused across fetches. When the files of the cache directory exceed maxBytes bytes, the least recently used files already written back are evicted; they are fetched again when needed. The task and manifest files are never evicted, nor are the internal files of the task root ('.d4talink') and the hidden temporary files, which are not written back either. The local copies are assumed current; if the validate parameter is set to True, they are checked against the remote files at each read, e.g. when other machines write the same tasks. The features working on the task directories as a whole, e.g. listTasks, pack and the partitioned datasets, see the files of the cache directory only; verifyTask checks the files evicted against the remote directory.
+
+    Attributes:
+    cache (str): The local cache directory, to be used as the task root.
+    remote (str): The remote directory.
+    maxBytes (int): The maximum size of the files of the cache directory in bytes; no limit by default (optional).
+    blockSize (int): The size in bytes of the blocks read from the remote files.
+    readAhead (int): The number of blocks read ahead.
+    maxHandles (int): The maximum number of open remote files.
+    workers (int): The number of threads writing back the files.
+    validate (bool): A flag to check the local copies against the remote files at each read.
+
+    Methods:
+    fetch(fn): Fetch a file from the remote directory, unless it is in the cache directory.
+    stats(): Get the counters of the cache.
+    """
+    local = True
+    # -------------------------------------
+    def __init__(self,cache,remote,maxBytes=None,blockSize=8 << 20,readAhead=4,maxHandles=32,
+                 workers=4,validate=False):
+        self.cache = os.path.abspath(cache)
+        self.remote = os.path.abspath(remote)
+        self.maxBytes = maxBytes
+        self.blockSize = blockSize
+        self.readAhead = readAhead
+        self.maxHandles = maxHandles
+        self.validate = validate
+        os.makedirs(self.cache,exist_ok=True)
+        os.makedirs(self.remote,exist_ok=True)
+        self._lock = threading.RLock()
+        self._lru = OrderedDict()
+        self._size = 0
+        self._scanned = False
+        self._clean = set()
+        self._dirty = {}
+        self._pending = {}
+        self._errors = []
+        self._gen = 0
+        self._handles = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "fetched": 0, "written": 0, "evicted": 0}
+        self._writers = ThreadPoolExecutor(max_workers=workers,thread_name_prefix="D4TAlink-writeback")
+        self._readers = ThreadPoolExecutor(max_workers=max(1,readAhead),thread_name_prefix="D4TAlink-readahead")
+    # -------------------------------------
+    def _remotePath(self,fn):
+        """Get the remote path of a file of the cache directory, or None for the files outside of it and for the internal and hidden files."""
+        rel = os.path.relpath(os.path.abspath(fn),self.cache)
+        parts = rel.split(os.sep)
+        if parts[0] == ".." or any(p.startswith(".") for p in parts):
+            return None
+        return os.path.join(self.remote,rel)
+    def _use(self,fn,size):
+        """Mark a local copy as the most recently used one; the caller holds the lock."""
+        self._size += size - self._lru.pop(fn,0)
+        self._lru[fn] = size
+    # -------------------------------------
+    def exists(self,fn):
+        if os.path.exists(fn):
+            return True
+        r = self._remotePath(fn)
+        return r is not None and os.path.exists(r)
+    def stat(self,fn):
+        try:
+            return os.stat(fn)
+        except FileNotFoundError:
+            r = self._remotePath(fn)
+            if r is None:
+                raise
+        try:
+            return os.stat(r)
+        except FileNotFoundError:
+            raise _notFound(fn) from None
+    def open(self,fn):
+        return open(self.fetch(fn),"rb")
+    def buffer(self,fn):
+        return _mapFile(self.fetch(fn))
+    def localPath(self,fn):
+        return self.fetch(fn)
+    def write(self,fn,write,fsync=None):
+        _atomicWrite(fn,write,fsync)
+        self.commit(fn,fsync)
+        return fn
+    def commit(self,fn,fsync=None):
+        if self._schedule(fn,fsync):
+            self._evict(fn)
+    def remove(self,fn):
+        r = self._remotePath(fn)
+        with self._lock:
+            self._dirty.pop(fn,None)
+            self._clean.discard(fn)
+            self._size -= self._lru.pop(fn,0)
+        found = False
+        for path in (fn,r):
+            if path is not None:
+                try:
+                    os.remove(path)
+                    found = True
+                except FileNotFoundError:
+                    pass
+        if not found:
+            raise _notFound(fn)
+    def makedirs(self,path):
+        os.makedirs(path,exist_ok=True)
+    # -------------------------------------
+    def _schedule(self,fn,fsync=None):
+        """Mark a file of the cache directory as dirty, and schedule its write-back unless one is pending."""
+        r = self._remotePath(fn)
+        if r is None:
+            return False
+        if fsync is None:
+            fsync = getTaskFsync()
+        size = os.path.getsize(fn)
+        with self._lock:
+            self._gen += 1
+            self._dirty[fn] = (self._gen,r,fsync)
+            self._clean.discard(fn)
+            self._use(fn,size)
+            if fn not in self._pending:
+                self._pending[fn] = self._writers.submit(self._writeBack,fn)
+        return True
+    def _writeBack(self,fn):
+        """Copy a file of the cache directory to the remote directory, until the copy is that of the last version written."""
+        while True:
+            with self._lock:
+                if fn not in self._dirty:
+                    self._pending.pop(fn,None)
+                    return
+                (gen,r,fsync) = self._dirty[fn]
+            try:
+                st = os.stat(fn)
+                os.makedirs(os.path.dirname(r),exist_ok=True)
+                def write(path):
+                    shutil.copyfile(fn,path)
+                    os.utime(path,ns=(st.st_atime_ns,st.st_mtime_ns))
+                _atomicWrite(r,write,fsync)
+            except BaseException as e:
+                if isinstance(e, FileNotFoundError) and not os.path.exists(fn):
+                    # The local file was removed meanwhile.
+                    with self._lock:
+                        if self._dirty.get(fn,(None,))[0] == gen:
+                            del self._dirty[fn]
+                            self._pending.pop(fn,None)
+                            return
+                    continue
+                with self._lock:
+                    self._pending.pop(fn,None)
+                    self._errors.append(e)
+                _log.error(f"Write-back of '{fn}' failed: {e!r}")
+                return
+            with self._lock:
+                entry = self._dirty.get(fn)
+                if entry is None:
+                    # The file was removed during the copy.
+                    try:
+                        os.remove(r)
+                    except FileNotFoundError:
+                        pass
+                elif entry[0] != gen:
+                    continue
+                else:
+                    del self._dirty[fn]
+                    self._clean.add(fn)
+                    self._stats["written"] += 1
+                self._pending.pop(fn,None)
+                return
+    def flush(self):
+        while True:
+            with self._lock:
+                for fn in self._dirty:
+                    if fn not in self._pending:
+                        self._pending[fn] = self._writers.submit(self._writeBack,fn)
+                futures = list(self._pending.values())
+            if futures:
+                wait(futures)
+            with self._lock:
+                for (fn,future) in list(self._pending.items()):
+                    if future.done():
+                        del self._pending[fn]
+                        if future.exception() is not None:
+                            self._errors.append(future.exception())
+                if self._errors:
+                    e = self._errors[0]
+                    self._errors = []
+                    raise e
+                if not self._pending:
+                    return
+    def close(self):
+        self.flush()
+        self._writers.shutdown()
+        self._readers.shutdown()
+        with self._lock:
+            for (fd,_) in self._handles.values():
+                os.close(fd)
+            self._handles.clear()
+    # -------------------------------------
+    def _acquire(self,r):
+        """Take an open handle of a remote file from the pool, or open one; the handle is reopened if the file was replaced."""
+        st = os.stat(r)
+        stamp = (st.st_ino,st.st_size,st.st_mtime_ns)
+        with self._lock:
+            entry = self._handles.pop(r,None)
+        if entry is not None:
+            if entry[1] == stamp:
+                return (entry[0],st)
+            os.close(entry[0])
+        return (os.open(r,os.O_RDONLY),st)
+    def _release(self,r,fd,st):
+        """Return a handle of a remote file to the pool, closing the least recently used handles beyond maxHandles."""
+        with self._lock:
+            old = self._handles.pop(r,None)
+            self._handles[r] = (fd,(st.st_ino,st.st_size,st.st_mtime_ns))
+            closing = [old[0]] if old is not None else []
+            while len(self._handles) > self.maxHandles:
+                closing.append(self._handles.popitem(last=False)[1][0])
+        for fd in closing:
+            os.close(fd)
+    def _copyRemote(self,r,path):
+        """Copy a remote file to a local path, reading blocks ahead in parallel, and set the mtime of the copy to that of the remote file."""
+        (fd,st) = self._acquire(r)
+        offsets = iter(range(0,st.st_size,self.blockSize))
+        blocks = deque()
+        try:
+            def readNext():
+                o = next(offsets,None)
+                if o is not None:
+                    blocks.append(self._readers.submit(os.pread,fd,self.blockSize,o))
+            with open(path,"wb") as fp:
+                for _ in range(max(1,self.readAhead)):
+                    readNext()
+                while blocks:
+                    data = blocks.popleft().result()
+                    readNext()
+                    fp.write(data)
+        except BaseException:
+            for b in blocks:
+                b.cancel()
+            wait(blocks)
+            os.close(fd)
+            raise
+        self._release(r,fd,st)
+        os.utime(path,ns=(st.st_atime_ns,st.st_mtime_ns))
+        return st
+    def _sameRemote(self,fn,r):
+        """Check if a local copy has the size and mtime of its remote file."""
+        try:
+            (st,rst) = (os.stat(fn),os.stat(r))
+        except FileNotFoundError:
+            return False
+        return st.st_size == rst.st_size and st.st_mtime_ns == rst.st_mtime_ns
+    def fetch(self,fn):
+        """Fetch a file from the remote directory, unless it is in the cache directory, and mark it as the most recently used one. A FileNotFoundError is raised if the file exists in neither directory.
+
+        Attributes:
+        fn (str): The file path.
+
+        Returns:
+        str: The file path.
+        """
+        r = self._remotePath(fn)
+        if r is None:
+            return fn
+        try:
+            size = os.path.getsize(fn)
+        except FileNotFoundError:
+            size = None
+        if (size is not None and self.validate and fn not in self._dirty and
+            os.path.exists(r) and not self._sameRemote(fn,r)):
+            size = None
+        if size is not None:
+            with self._lock:
+                self._use(fn,size)
+                self._stats["hits"] += 1
+            return fn
+        os.makedirs(os.path.dirname(fn),exist_ok=True)
+        result = {}
+        try:
+            _atomicWrite(fn,lambda path: result.setdefault("st",self._copyRemote(r,path)),False)
+        except FileNotFoundError:
+            raise _notFound(fn) from None
+        with self._lock:
+            self._use(fn,result["st"].st_size)
+            self._clean.add(fn)
+            self._stats["misses"] += 1
+            self._stats["fetched"] += result["st"].st_size
+        self._evict(fn)
+        return fn
+    # -------------------------------------
+    def _scan(self):
+        """List the files of the cache directory left by previous processes, as the least recently used ones, by mtime; the caller holds the lock."""
+        if self._scanned:
+            return
+        self._scanned = True
+        found = []
+        for (path,dirs,files) in os.walk(self.cache):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            for f in files:
+                fn = os.path.join(path,f)
+                if fn not in self._lru and not f.startswith("."):
+                    try:
+                        st = os.stat(fn)
+                    except FileNotFoundError:
+                        continue
+                    found.append((st.st_mtime_ns,fn,st.st_size))
+        for (_,fn,size) in sorted(found,reverse=True):
+            self._lru[fn] = size
+            self._lru.move_to_end(fn,last=False)
+            self._size += size
+    def _evict(self,keep=None):
+        """Evict the least recently used files already written back, until the files of the cache directory fit in maxBytes, except the file just fetched or written, which the caller is about to use. The files of previous processes are checked against the remote directory first, and written back if they differ."""
+        if self.maxBytes is None:
+            return
+        with self._lock:
+            self._scan()
+            excess = self._size - self.maxBytes
+            candidates = []
+            for (fn,size) in self._lru.items():
+                if excess <= 0:
+                    break
+                if fn == keep or fn in self._dirty or fn.endswith(("_task.json","_manifest.json","_manifest.jsonl")):
+                    continue
+                candidates.append((fn,size,fn in self._clean))
+                excess -= size
+        for (fn,size,clean) in candidates:
+            r = self._remotePath(fn)
+            if r is None:
+                continue
+            if not clean and not self._sameRemote(fn,r):
+                if os.path.exists(fn):
+                    self._schedule(fn)
+                continue
+            with self._lock:
+                if fn in self._dirty or self._lru.get(fn) != size:
+                    continue
+                try:
+                    os.remove(fn)
+                except FileNotFoundError:
+                    pass
+                self._size -= self._lru.pop(fn)
+                self._clean.discard(fn)
+                self._stats["evicted"] += 1
+    # -------------------------------------
+    def stats(self):
+        """Get the counters of the cache: hits and misses of the reads, bytes fetched, files written back and evicted, size of the files of the cache directory, and files waiting for their write-back.
+
+        Returns:
+        dict: The counters of the cache.
+        """
+        with self._lock:
+            return dict(self._stats,bytes=self._size,pending=len(self._dirty))
+# -------------------------------------------------------------------------------
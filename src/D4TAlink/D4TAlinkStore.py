@@ -0,0 +1,120 @@
+"""
+D4TAlinkStore
+
+D4TAlink content-addressed artifact store.
+"""
+
+__all__ = ["pruneBlobStore"]
+
+import os
+import uuid
+import shutil
+import hashlib
+from .D4TAlinkPar import *
+from .D4TAlinkLock import _fsyncFile
+
+# -------------------------------------------------------------------------------
+class _HashSink:
+    """Write-only file object computing the SHA-256 digest of the bytes written to it, and passing them on to a file object if one is given."""
+    def __init__(self,fp=None):
+        self.fp = fp
+        self.hash = hashlib.sha256()
+        self.size = 0
+    def write(self,b):
+        if self.fp is not None:
+            self.fp.write(b)
+        self.hash.update(b)
+        self.size += len(b)
+        return len(b)
+# -------------------------------------------------------------------------------
+def _hashFile(fn,bufsize=1 << 20,storage=None):
+    """Compute the SHA-256 digest of a file, reading it in large blocks, through a storage backend if one is given."""
+    h = hashlib.sha256()
+    with (open(fn,"rb") if storage is None else storage.open(fn)) as fp:
+        for b in iter(lambda: fp.read(bufsize),b""):
+            h.update(b)
+    return h.hexdigest()
+# -------------------------------------------------------------------------------
+def _blobRoot():
+    """Get the directory of the blob store, in the '.d4talink' directory of the task root."""
+    return os.path.join(getTaskRoot(),".d4talink","blobs")
+# -------------------------------------------------------------------------------
+def _blobPath(digest):
+    """Get the file path of the blob with the given digest."""
+    return os.path.join(_blobRoot(),digest[:2],digest[2:4],digest)
+# -------------------------------------------------------------------------------
+def _linkBlob(bfn,fn):
+    """Make the file path refer to the blob, with a hard link if possible and a copy otherwise. The file path is replaced atomically, and left untouched if it already refers to the blob."""
+    try:
+        if os.path.samefile(bfn,fn):
+            return
+    except FileNotFoundError:
+        pass
+    tfn = f"{fn}.{uuid.uuid4().hex}.tmp"
+    try:
+        os.link(bfn,tfn)
+    except OSError:
+        shutil.copyfile(bfn,tfn)
+    os.replace(tfn,fn)
+# -------------------------------------------------------------------------------
+def _storeArtifact(fn,write,stream=None):
+    """Save an artifact through the content-addressed blob store. The content is stored once in the blob store of the task root, under its SHA-256 digest, and the file path is a hard link to the blob (or a copy if hard links are not supported). If a stream function is given, the content is first only hashed, and nothing is written if the blob already exists. Blobs are read-only, so that a shared content cannot be altered through one of its links.
+
+    Attributes:
+    fn (str): The file path of the artifact.
+    write (function): A function writing the content to a given file path.
+    stream (function): A function writing the content to a given file object (optional).
+
+    Returns:
+    str: The SHA-256 digest of the content.
+    """
+    if stream is not None:
+        sink = _HashSink()
+        stream(sink)
+        bfn = _blobPath(sink.hash.hexdigest())
+        if os.path.exists(bfn):
+            _linkBlob(bfn,fn)
+            return sink.hash.hexdigest()
+    tmpDir = os.path.join(_blobRoot(),"tmp")
+    os.makedirs(tmpDir,exist_ok=True)
+    tfn = os.path.join(tmpDir,f"{uuid.uuid4().hex}-{os.path.basename(fn)}")
+    try:
+        write(tfn)
+        if getTaskFsync():
+            _fsyncFile(tfn)
+        digest = _hashFile(tfn)
+        bfn = _blobPath(digest)
+        if os.path.exists(bfn):
+            os.remove(tfn)
+        else:
+            os.makedirs(os.path.dirname(bfn),exist_ok=True)
+            os.chmod(tfn,0o444)
+            os.replace(tfn,bfn)
+    except BaseException:
+        if os.path.exists(tfn):
+            os.remove(tfn)
+        raise
+    _linkBlob(bfn,fn)
+    return digest
+# -------------------------------------------------------------------------------
+def pruneBlobStore():
+    """Remove the blobs that are no longer referenced by any task file. A blob is unreferenced when it has no other hard link. On filesystems without hard links, the task files are independent copies, so their blobs are removed as well; this only affects the detection of unchanged content by later saves. The function should not run while tasks are being saved.
+
+    Returns:
+    int: The number of bytes freed.
+    """
+    freed = 0
+    root = _blobRoot()
+    if not os.path.exists(root):
+        return freed
+    for (path,dirs,files) in os.walk(root):
+        if os.path.basename(path) == "tmp":
+            continue
+        for f in files:
+            bfn = os.path.join(path,f)
+            st = os.stat(bfn)
+            if st.st_nlink == 1:
+                os.remove(bfn)
+                freed += st.st_size
+    return freed
+# -------------------------------------------------------------------------------
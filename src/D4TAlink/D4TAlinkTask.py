@@ -5,19 +5,377 @@ D4TAlink Task class.
 """
 
 __all__ = ["loadTask",
+           "loadTasks",
+           "aloadTask",
+           "acreateTask",
+           "clearDirCache",
            "Task"]
 
 from datetime import datetime
 import os
+import io
 from pathlib import Path
 import json
 import pickle
-import pandas as pd
+import gzip
+import bz2
+import lzma
+import hashlib
+import mmap
+import struct
+import shutil
+import uuid
+import operator
+from urllib.parse import unquote
+import time
+import logging
+import functools
+import contextvars
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
 from .D4TAlinkPar import *
+from .D4TAlinkPar import _clearRootCache, _checkLocalStorage
+from .D4TAlinkStore import _storeArtifact, _HashSink
+from .D4TAlinkLock import fileLock
+from .D4TAlinkStorage import LocalBackend
+from .D4TAlinkManifest import (_recordArtifacts, _removeArtifacts, _tracked, _readManifest,
+                               _manifestPath)
+from .D4TAlinkPack import _writePack, _openPack, _closePack
+from .D4TAlinkCodec import _D4TAlinkCodecs, _codec, _codecOpen, _magicCodec
+from .D4TAlinkAsync import _runAsync
+from .D4TAlinkCache import (_CACHE_SUBDIR, _D4TAlinkCacheLock, _cacheKey, _readCacheIndex,
+                            _writeCacheIndex, _removeCacheEntry, _evictCache)
+from .D4TAlinkInstrument import _instrumented, _traceFile, _traceMkdir
 
+_log = logging.getLogger("D4TAlink")
+
+# Directories known to exist, shared by all tasks of the process.
+_D4TAlinkKnownDirs = set()
+# Names of the files of the directories listed by the process, with the files
+# it saved since, to find the variants of a file saved (see _removeVariants).
+_D4TAlinkDirFiles = {}
+# Container of the out-of-band pickle buffers: magic number and alignment.
+_PKB_MAGIC = b"D4TAPKB1"
+_PKB_ALIGN = 64
+# Compression of the CSV reports: file extension and opener.
+_CSV_COMPRESSION = {None: ("csv", open),
+                    "gzip": ("csv.gz", gzip.open),
+                    "bz2": ("csv.bz2", bz2.open),
+                    "xz": ("csv.xz", lzma.open)}
+
+# -------------------------------------------------------------------------------
+def _makeDir(path):
+    """Create a directory through the storage backend, unless it is already known to exist in this process."""
+    if path not in _D4TAlinkKnownDirs:
+        storage = getTaskStorage()
+        if not storage.local:
+            storage.makedirs(path)
+            return
+        t0 = time.perf_counter()
+        storage.makedirs(path)
+        _D4TAlinkKnownDirs.add(path)
+        _traceMkdir(path,time.perf_counter() - t0)
+# -------------------------------------------------------------------------------
+def clearDirCache():
+    """Clear the process-wide set of directories known to exist, including the root directories, and the listings of the task directories, which find the other variants of a file saved (e.g. compressed or not). This is needed if task directories are removed by another process or outside of D4TAlink, so that they are created again when needed, or if task files are saved by them."""
+    _D4TAlinkKnownDirs.clear()
+    _D4TAlinkDirFiles.clear()
+    _clearRootCache()
+# -------------------------------------------------------------------------------
+def _removeVariants(fn,ext,exts):
+    """Remove the other variants of a file saved with an extension, i.e. the files of the same path with the other extensions given, e.g. the compressed and uncompressed versions of a file. With the LocalBackend storage, the directory of the file is listed once by the process, and the files it saves are added to the listing (see _writeArtifact), so that a save does not look up each variant; the files saved by other processes since are not seen, until clearDirCache is called."""
+    storage = getTaskStorage()
+    (path,name) = os.path.split(fn)
+    base = name[:-len(ext) - 1]
+    names = None
+    if isinstance(storage, LocalBackend):
+        names = _D4TAlinkDirFiles.get(path)
+        if names is None:
+            try:
+                names = set(os.listdir(path))
+            except FileNotFoundError:
+                names = set()
+            names = _D4TAlinkDirFiles.setdefault(path,names)
+    for e in exts:
+        vfn = os.path.join(path,f"{base}.{e}")
+        if e != ext and (storage.exists(vfn) if names is None else f"{base}.{e}" in names):
+            _removeArtifacts([vfn])
+            if names is not None:
+                names.discard(f"{base}.{e}")
+# -------------------------------------------------------------------------------
+def _forgetDirFiles(prefixes):
+    """Forget the listings of the directories starting with some path prefixes, given as a tuple."""
+    for path in [p for p in _D4TAlinkDirFiles.copy() if p.startswith(prefixes)]:
+        _D4TAlinkDirFiles.pop(path,None)
+# -------------------------------------------------------------------------------
+def _writeArtifact(fn,write,stream=None,dedup=False,fsync=None,record=True):
+    """Write an artifact to a file path through the storage backend. The write function writes the content to a given file path; the optional stream function writes the same content to a given file object. The content is written to a temporary file renamed to the file path, so that a crashed or concurrent writer never leaves a partial file, and a file shared with the blob store is replaced rather than altered. If the dedup parameter is set to True, the content is saved through the content-addressed blob store. Unless the record parameter is set to False, the artifact is recorded in the manifest of its task, with the digest of its content computed while the stream function writes it, and the size and mtime of the file object written, so that the file is neither read nor looked up again. With a storage backend without local files, the blob store and the manifest are not used."""
+    storage = getTaskStorage()
+    digest = None
+    st = None
+    if dedup and storage.local:
+        digest = _storeArtifact(fn,write,stream)
+        storage.commit(fn,fsync)
+    elif record and storage.local and stream is not None:
+        sinks = []
+        def tee(path):
+            with open(path,"wb") as fp:
+                sinks.append(_HashSink(fp))
+                stream(sinks[-1])
+                fp.flush()
+                sinks[-1].stat = os.fstat(fp.fileno())
+        storage.write(fn,tee,fsync)
+        digest = sinks[-1].hash.hexdigest()
+        st = sinks[-1].stat
+    else:
+        storage.write(fn,write,fsync)
+    if record and storage.local:
+        _recordArtifacts([fn],[digest],[st])
+    (path,name) = os.path.split(fn)
+    names = _D4TAlinkDirFiles.get(path)
+    if names is not None:
+        names.add(name)
+    _traceFile(fn)
+    return fn
+# -------------------------------------------------------------------------------
+def _writeJson(fn,obj):
+    """Write an object to a JSON file, atomically."""
+    data = json.dumps(obj).encode()
+    def write(path):
+        with open(path,"wb") as fp:
+            fp.write(data)
+    return _writeArtifact(fn,write,lambda fp: fp.write(data))
+# -------------------------------------------------------------------------------
+def _writeTaskFile(fn,metadata):
+    """Write a task file, and touch the output directory of its package, so that the task catalog sees the change from the directory mtime, without looking up every task file (see refreshCatalog)."""
+    _writeJson(fn,metadata)
+    if getTaskStorage().local:
+        try:
+            os.utime(os.path.dirname(os.path.dirname(os.path.dirname(fn))))
+        except FileNotFoundError:
+            pass
+# -------------------------------------------------------------------------------
+def _writePickleContainer(fp,data,buffers):
+    """Write a pickle stream and its out-of-band buffers to a container file object. The container holds a header with the offset and length of each section, followed by the sections, each aligned to 64 bytes: the pickle stream first, then the buffers. Since the stream and its buffers are in a single file, written atomically, a reader cannot mix the stream of one save with the buffers of another."""
+    raws = [memoryview(data)] + [b.raw() for b in buffers]
+    offset = len(_PKB_MAGIC) + 8 + 16 * len(raws)
+    index = []
+    for r in raws:
+        offset += -offset % _PKB_ALIGN
+        index.append((offset,r.nbytes))
+        offset += r.nbytes
+    fp.write(_PKB_MAGIC)
+    fp.write(struct.pack("<Q",len(raws)))
+    for (o,n) in index:
+        fp.write(struct.pack("<QQ",o,n))
+    pos = len(_PKB_MAGIC) + 8 + 16 * len(raws)
+    for ((o,n),r) in zip(index,raws):
+        fp.write(b"\0" * (o - pos))
+        fp.write(r)
+        pos = o + n
+# -------------------------------------------------------------------------------
+def _readPickleContainer(fn,memoryMap=True,buffer=None):
+    """Read the sections of a pickle container file (see _writePickleContainer): the pickle stream, then its out-of-band buffers. If the memoryMap parameter is set to True, the sections are read-only views of the memory-mapped file, so that pages are only read when touched and are shared between processes; otherwise they are read into writable memory. If a buffer is given, e.g. a member of a task archive, the container is read from it instead of the file."""
+    if buffer is None:
+        with open(fn,"rb") as fp:
+            if fp.read(len(_PKB_MAGIC)) != _PKB_MAGIC:
+                raise ValueError(f"File '{fn}' is not a pickle buffer container.")
+            (count,) = struct.unpack("<Q",fp.read(8))
+            index = [struct.unpack("<QQ",fp.read(16)) for _ in range(count)]
+            if memoryMap:
+                mv = memoryview(mmap.mmap(fp.fileno(),0,access=mmap.ACCESS_READ))
+                return [mv[o:o+n] for (o,n) in index]
+            buffers = []
+            for (o,n) in index:
+                b = bytearray(n)
+                fp.seek(o)
+                fp.readinto(b)
+                buffers.append(b)
+            return buffers
+    mv = memoryview(buffer)
+    if bytes(mv[:len(_PKB_MAGIC)]) != _PKB_MAGIC:
+        raise ValueError(f"File '{fn}' is not a pickle buffer container.")
+    (count,) = struct.unpack_from("<Q",mv,len(_PKB_MAGIC))
+    index = [struct.unpack_from("<QQ",mv,len(_PKB_MAGIC) + 8 + 16 * i) for i in range(count)]
+    if memoryMap:
+        return [mv[o:o+n] for (o,n) in index]
+    return [bytearray(mv[o:o+n]) for (o,n) in index]
+# -------------------------------------------------------------------------------
+def _importArrow():
+    """Import the optional pyarrow dependency, used for the parquet and feather formats."""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        import pyarrow.feather
+        import pyarrow.dataset
+    except ImportError:
+        raise ImportError("The 'pyarrow' package is required for the parquet and feather formats: pip install d4talink[arrow]")
+    return pyarrow
+# -------------------------------------------------------------------------------
+def _writeXlsx(fn,df,constantMemory=False):
+    """Write a DataFrame or a dictionary of DataFrames to an Excel file. In constant memory mode, the rows are written one at a time with xlsxwriter, which flushes each row to disk as soon as the next one is started."""
+    import pandas as pd
+    if isinstance(df, pd.DataFrame):
+        df = {"worksheet": df}
+    elif not isinstance(df, dict):
+        raise TypeError("The report must be a DataFrame or a dictionary of DataFrames.")
+    if not constantMemory:
+        if len(df) == 1 and "worksheet" in df:
+            df["worksheet"].to_excel(fn,sheet_name='worksheet',index=False)
+        else:
+            with pd.ExcelWriter(fn, engine='xlsxwriter') as writer:
+                for (k,v) in df.items():
+                    v.to_excel(writer,sheet_name=k,index=False)
+        return
+    import xlsxwriter
+    wb = xlsxwriter.Workbook(fn,{"constant_memory": True,
+                                 "nan_inf_to_errors": True,
+                                 "default_date_format": "yyyy-mm-dd hh:mm:ss"})
+    try:
+        for (k,v) in df.items():
+            ws = wb.add_worksheet(k)
+            ws.write_row(0,0,[str(c) for c in v.columns])
+            r = 1
+            for i in range(0,len(v),10000):
+                chunk = v.iloc[i:i+10000].astype(object)
+                for row in chunk.where(chunk.notna(),None).itertuples(index=False,name=None):
+                    ws.write_row(r,0,row)
+                    r += 1
+    finally:
+        wb.close()
+# -------------------------------------------------------------------------------
+def _writeReportJob(format,fn,df,constantMemory,fsync=None):
+    """Write one report file of a batch export, and return the time taken in seconds. The file is recorded in the manifest of its task by the caller, since the job may run in another process."""
+    t0 = time.perf_counter()
+    if format == "xlsx":
+        _writeArtifact(fn,lambda path: _writeXlsx(path,df,constantMemory),fsync=fsync,record=False)
+    elif format == "csv":
+        _writeArtifact(fn,lambda path: df.to_csv(path,index=False),fsync=fsync,record=False)
+    elif format == "parquet":
+        _importArrow()
+        _writeArtifact(fn,lambda path: df.to_parquet(path,index=False),fsync=fsync,record=False)
+    return time.perf_counter() - t0
+# -------------------------------------------------------------------------------
+_FILTER_OPS = {"==": operator.eq, "=": operator.eq, "!=": operator.ne, "<": operator.lt,
+               "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+               "in": lambda a,b: a in b, "not in": lambda a,b: a not in b}
+def _partitionFiles(pa,path,fields,filters):
+    """List the files of a hive-partitioned dataset, only descending into the partition directories that can match the filters. The filters are a list of (column, operator, value) tuples, all of which must match; other filter forms list all partitions."""
+    conds = {}
+    if filters and all(isinstance(f, tuple) for f in filters):
+        for (col,op,val) in filters:
+            if op in _FILTER_OPS:
+                conds.setdefault(col,[]).append((_FILTER_OPS[op],val))
+    def match(field,name):
+        if field.name not in conds:
+            return True
+        try:
+            v = pa.array([unquote(name.split("=",1)[1])]).cast(field.type)[0].as_py()
+            return all(op(v,val) for (op,val) in conds[field.name])
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError, TypeError):
+            return True
+    dirs = [path]
+    for field in fields:
+        dirs = [e.path for d in dirs for e in os.scandir(d)
+                if e.is_dir() and e.name.startswith(f"{field.name}=") and match(field,e.name)]
+    return sorted(e.path for d in dirs for e in os.scandir(d)
+                  if e.is_file() and not e.name.startswith(("_",".")))
+# -------------------------------------------------------------------------------
+class _ExcelSheets(Mapping):
+    """Read-only mapping of the worksheets of an Excel file, given as a file path or a file object, in which each worksheet is parsed on first access. If a cache directory is given, the parsed worksheets are stored in it, keyed by the mtime and size of the Excel file, and are reused as long as the file does not change."""
+    # -------------------------------------
+    def __init__(self,fn,cacheDir=None):
+        self._fn = fn
+        self._cacheDir = cacheDir
+        self._xls = None
+        self._names = None
+        self._sheets = {}
+        if cacheDir is not None:
+            st = os.stat(fn)
+            self._stamp = f"{st.st_mtime_ns}_{st.st_size}"
+    # -------------------------------------
+    def _excel(self):
+        if self._xls is None:
+            import pandas as pd
+            self._xls = pd.ExcelFile(self._fn)
+        return self._xls
+    # -------------------------------------
+    def _cached(self,key,parse):
+        if self._cacheDir is None:
+            return parse()
+        cfn = os.path.join(self._cacheDir,
+                           f"{self._stamp}_{hashlib.sha1(key.encode()).hexdigest()}.pkl")
+        try:
+            with open(cfn,"rb") as fp:
+                return pickle.load(fp)
+        except FileNotFoundError:
+            pass
+        obj = parse()
+        os.makedirs(self._cacheDir,exist_ok=True)
+        for f in os.listdir(self._cacheDir):
+            if not f.startswith(self._stamp):
+                try:
+                    os.remove(os.path.join(self._cacheDir,f))
+                except FileNotFoundError:
+                    pass
+        tfn = f"{cfn}.{os.getpid()}.tmp"
+        with open(tfn,"wb") as fp:
+            pickle.dump(obj,fp)
+        os.replace(tfn,cfn)
+        return obj
+    # -------------------------------------
+    def sheetNames(self):
+        """Get the names of the worksheets."""
+        if self._names is None:
+            self._names = self._cached("\0sheetnames",lambda: self._excel().sheet_names)
+        return self._names
+    # -------------------------------------
+    def __getitem__(self,sheet):
+        if sheet not in self._sheets:
+            if sheet not in self.sheetNames():
+                raise KeyError(sheet)
+            self._sheets[sheet] = self._cached(sheet,lambda: self._excel().parse(sheet))
+        return self._sheets[sheet]
+    def __iter__(self):
+        return iter(self.sheetNames())
+    def __len__(self):
+        return len(self.sheetNames())
+    # -------------------------------------
+    def close(self):
+        """Close the Excel file."""
+        if self._xls is not None:
+            self._xls.close()
+            self._xls = None
+    def __enter__(self):
+        return self
+    def __exit__(self,*args):
+        self.close()
 # -------------------------------------------------------------------------------
-def loadTask(project, package, taskname, sponsor=None, quiet=False):
-    """Load a task from the task files. The task is identified by the project, package, and taskname. The function returns the task object. If the task does not exist, the function raises a FileNotFoundError exception. If the sponsor is not specified, the function uses the default sponsor. If the task does not exist and the quiet parameter is set to True, the function returns None. If the task does not exist and the quiet parameter is set to False, the function raises a FileNotFoundError exception.
+def _taskPaths(root,sponsor,project,package,task):
+    """Get the paths for the task directories below a task root."""
+    taskRoot = os.path.join(root,sponsor,project,package)
+    return {
+        "documentation": os.path.join(taskRoot,"docs"),
+        "code": os.path.join(taskRoot,"progs"),
+        "data": os.path.join(taskRoot,"output",task),
+        "data_source": os.path.join(taskRoot,"raw"),
+        "binary_data": os.path.join(taskRoot,"output",task,"bin"),
+        "binary": os.path.join(taskRoot,"output",task,"bin")
+    }
+# -------------------------------------------------------------------------------
+def _setTaskAttributes(ta,ita):
+    """Set the attributes of a task from the content of its task file."""
+    for(k,v) in ita.items():
+        if isinstance(getattr(ta,k,None), str) and not isinstance(v, str):
+            if not hasattr(v, 'join'):
+                v = "\n".join(v)
+        setattr(ta,k,v)
+    return ta
+# -------------------------------------------------------------------------------
+
+# -------------------------------------------------------------------------------
+def loadTask(project, package, taskname, sponsor=None, quiet=False, readOnly=False):
+    """Load a task from the task files. The task is identified by the project, package, and taskname. The function returns the task object. If the task does not exist, the function raises a FileNotFoundError exception. If the sponsor is not specified, the function uses the default sponsor. If the task does not exist and the quiet parameter is set to True, the function returns None. If the task does not exist and the quiet parameter is set to False, the function raises a FileNotFoundError exception. Loading a task does not create any directory.
     
     Attributes:
     project (str): The project for the task.
@@ -25,29 +383,100 @@ def loadTask(project, package, taskname, sponsor=None, quiet=False):
     Taskname (str): The name of the task.
     sponsor (str): The sponsor for the task (optional).
     quiet (bool): A flag to suppress the FileNotFoundError exception.
+    readOnly (bool): A flag to load the task in read-only mode, in which no directory is ever created.
 
     Returns:
     Task: The task object.
     """
     if sponsor is None:
         sponsor = getTaskSponsor()
-    ta = Task(project, package, taskname, sponsor, author="-",blank=True)
-    fn = ta.binaryFn("task",'json')
-    task = None
-    if(not quiet and not os.path.exists(fn)):
-        raise FileNotFoundError(f"Task '{taskname}' does not exist: '{fn}'")
-    elif(os.path.exists(fn)):
-        with open(fn,"r") as fp:
+    ta = Task(project, package, taskname, sponsor, author="-",blank=True,readOnly=readOnly)
+    fn = ta.binaryFn("task",'json',dirCreate=False)
+    try:
+        with getTaskStorage().open(fn) as fp:
             ita = json.load(fp)
-        for(k,v) in ita.items():
-            if isinstance(getattr(ta,k), str) and not isinstance(v, str):
-                if not hasattr(v, 'join'):
-                    v = "\n".join(v)
-            setattr(ta,k,v)
-        task = ta
-    else :
-        task = None
-    return task
+    except FileNotFoundError:
+        if not quiet:
+            raise FileNotFoundError(f"Task '{taskname}' does not exist: '{fn}'")
+        return None
+    return _setTaskAttributes(ta,ita)
+# -------------------------------------------------------------------------------
+def loadTasks(tasks, sponsor=None, quiet=False, readOnly=False, workers=8):
+    """Load several tasks from the task files. The tasks are given as (project, package, taskname) or (sponsor, project, package, taskname) tuples; if the sponsor is not specified, the function uses the default sponsor. The task files are read and parsed in parallel in a pool of threads, the task root is checked only once, and no directory is created. The function returns a dictionary of task objects keyed by (sponsor, project, package, taskname). If some tasks do not exist and the quiet parameter is set to False, the function raises a single FileNotFoundError exception listing all of them; if the quiet parameter is set to True, their value in the dictionary is None.
+
+    Attributes:
+    tasks (list): The tasks to load.
+    sponsor (str): The sponsor for the tasks (optional).
+    quiet (bool): A flag to suppress the FileNotFoundError exception.
+    readOnly (bool): A flag to load the tasks in read-only mode, in which no directory is ever created.
+    workers (int): The maximum number of threads.
+
+    Returns:
+    dict: The task objects.
+    """
+    keys = []
+    for t in tasks:
+        t = tuple(t)
+        if len(t) == 3:
+            if sponsor is None:
+                sponsor = getTaskSponsor()
+            t = (sponsor,) + t
+        elif len(t) != 4:
+            raise ValueError(f"Task '{t}' must be a (sponsor, project, package, taskname) tuple.")
+        keys.append(t)
+    keys = list(dict.fromkeys(keys))
+    root = getTaskRoot()
+    def load(key):
+        (sp,pr,pa,tn) = key
+        paths = _taskPaths(root,sp,pr,pa,tn)
+        fn = os.path.join(paths["binary"],f"{tn}_task.json")
+        try:
+            with getTaskStorage().open(fn) as fp:
+                ita = json.load(fp)
+        except FileNotFoundError:
+            return (fn,None)
+        ta = Task(pr,pa,tn,sp,author="-",blank=True,readOnly=readOnly)
+        ta._paths = (root,paths)
+        return (fn,_setTaskAttributes(ta,ita))
+    ctx = contextvars.copy_context()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        loaded = list(pool.map(lambda key: ctx.copy().run(load,key),keys))
+    missing = [fn for (fn,ta) in loaded if ta is None]
+    if missing and not quiet:
+        raise FileNotFoundError(f"{len(missing)} task(s) do not exist: " + ", ".join(f"'{fn}'" for fn in missing))
+    return {k: ta for (k,(fn,ta)) in zip(keys,loaded)}
+# -------------------------------------------------------------------------------
+async def aloadTask(project, package, taskname, sponsor=None, quiet=False, readOnly=False):
+    """Load a task from the task files, without blocking the event loop. The task is loaded by loadTask on the executor set by setAsyncExecutor.
+
+    Attributes:
+    project (str): The project for the task.
+    package (str): The package for the task.
+    Taskname (str): The name of the task.
+    sponsor (str): The sponsor for the task (optional).
+    quiet (bool): A flag to suppress the FileNotFoundError exception.
+    readOnly (bool): A flag to load the task in read-only mode.
+
+    Returns:
+    Task: The task object.
+    """
+    return await _runAsync(loadTask,project,package,taskname,sponsor,quiet,readOnly)
+# -------------------------------------------------------------------------------
+async def acreateTask(project, package, taskname, sponsor=None, author=None, overwrite=False):
+    """Create a task and write its task file, without blocking the event loop. The task is created by the Task constructor on the executor set by setAsyncExecutor.
+
+    Attributes:
+    project (str): The project for the task.
+    package (str): The package for the task.
+    taskname (str): The name of the task.
+    sponsor (str): The sponsor for the task (optional).
+    author (str): The author of the task (optional).
+    overwrite (bool): A flag to overwrite an existing task.
+
+    Returns:
+    Task: The task object.
+    """
+    return await _runAsync(Task,project,package,taskname,sponsor,author,overwrite)
 # -------------------------------------------------------------------------------
 
 # -------------------------------------------------------------------------------
@@ -67,7 +496,9 @@ class Task:
     copyright (str): The copyright for the task reports.
 
     Methods:
+    setDependencies(dependencies): Set the dependencies of the task, and save them to the task file.
     getTaskPaths(dirCreate=False): Get the paths for the task directories.
+    clearPathCache(): Clear the cached paths for the task directories.
     getTaskFilepath(type,ext,dirtype,subdir=None,dirCreate=True): Get the file path for a task file.
     docFn(type,ext,subdir=None,dirCreate=True): Get the file path for a documentation file.
     binaryFn(type,ext,subdir=None,dirCreate=True): Get the file path for a binary file.
@@ -77,11 +508,18 @@ class Task:
     binaryDir(subdir=None,dirCreate=True): Get the directory for a binary file.
     reportDir(subdir=None,dirCreate=True): Get the directory for a report file.
     dataSourceDir(subdir=None,dirCreate=True): Get the directory for a data source file.
+    cached(name,maxEntries=None,maxBytes=None,compression=None): Get a decorator caching the results of a function in the task.
+    cacheInfo(): Get the content of the result cache of the task.
+    clearCache(name=None): Remove the results of the result cache of the task.
+    pack(compression=None,remove=True): Pack the files of the task into a single archive.
+    unpack(remove=True): Extract the files of the task from its archive.
+    submitWrite(method,*args,**kwargs): Queue a write of the task, to run in the background.
+    flushWrites(): Wait for the queued writes of the task to complete.
     """
     # -------------------------------------
     def __init__(self,
                  project, package, taskname, sponsor=None, author=None, 
-                 overwrite=False,blank=False):
+                 overwrite=False,blank=False,readOnly=False):
         """
         Initialize the Task object.
         
@@ -93,6 +531,7 @@ class Task:
         author (str): The author of the task.
         overwrite (bool): A flag to overwrite an existing task.
         blank (bool): A flag to create a blank task.
+        readOnly (bool): A flag to never create the task directories.
 
         Returns:
         Task: The task object.
@@ -101,10 +540,14 @@ class Task:
             sponsor = getTaskSponsor()
         if author is None:
             author = getTaskAuthor()
+        self._readOnly = readOnly
+        self._paths = None
+        self._writes = None
         if blank :
             sessionStr = ""
-            yr = datetime.now().strftime('%Y')
-            dt = datetime.now().strftime('%Y-%m-%d')
+            now = datetime.now()
+            yr = now.strftime('%Y')
+            dt = now.strftime('%Y-%m-%d')
             self.task      = taskname
             self.project   = project
             self.package   = package
@@ -116,23 +559,49 @@ class Task:
             self.version   = "0.0"
             self.dependencies = sessionStr
         else :
-            ta = Task(project, package, taskname, sponsor, author, blank=True)
+            ta = Task(project, package, taskname, sponsor, author, blank=True, readOnly=readOnly)
             #print(ta.__dict__)
             self.__dict__.update(ta.__dict__)
             #print(self.__dict__)
             fn = ta.binaryFn("task",'json')
-            if os.path.exists(fn) and not overwrite:
-                raise FileExistsError(f"Task '{taskname}' already exists.")
-            with open(fn,"w") as fp:
-                json.dump(self.__dict__,fp)
+            with fileLock(fn):
+                if getTaskStorage().exists(fn) and not overwrite:
+                    raise FileExistsError(f"Task '{taskname}' already exists.")
+                _writeTaskFile(fn,self._metadata())
         return None
     # -------------------------------------
+    def _metadata(self):
+        """Get the task attributes that are stored in the task file."""
+        return {k: v for (k,v) in self.__dict__.items() if not k.startswith("_")}
+    # -------------------------------------
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_writes"] = None
+        return state
+    # -------------------------------------
     def __str__(self):
         return(self.sponsor + " - " + self.project + " - " + 
                self.package + " - " + self.task)
     # -------------------------------------
+    def setDependencies(self,dependencies):
+        """Set the dependencies of the task, and save them to the task file. Each dependency is 'taskname' for a task of the same package, 'package/taskname' for a task of the same project, or 'project/package/taskname'; see runTasks to run the tasks in the order of their dependencies.
+
+        Attributes:
+        dependencies (list): The dependencies of the task, as a list or a string with one dependency per line.
+
+        Returns:
+        str: The dependencies of the task, one per line.
+        """
+        if not isinstance(dependencies, str):
+            dependencies = "\n".join(dependencies)
+        self.dependencies = dependencies
+        fn = self.binaryFn("task",'json')
+        with fileLock(fn):
+            _writeTaskFile(fn,self._metadata())
+        return self.dependencies
+    # -------------------------------------
     def getTaskPaths(self,dirCreate=False):
-        """Get the paths for the task directories. The function returns a dictionary with the paths for the task directories. The directories are created if the dirCreate parameter is set to True.
+        """Get the paths for the task directories. The function returns a dictionary with the paths for the task directories. The directories are created if the dirCreate parameter is set to True, unless the task is read-only. The paths are cached in the task object until the task root changes or clearPathCache is called, and each directory is created at most once per process.
         
         Attributes:
         dirCreate (bool): A flag to create the directories.
@@ -140,25 +609,29 @@ class Task:
         Returns:
         dict: The paths for the task directories.
         """
-        taskRoot = os.path.join(getTaskRoot(),
-                                self.sponsor,
-                                self.project,
-                                self.package)
-        taskPaths = {
-            "documentation": os.path.join(taskRoot,"docs"),
-            "code": os.path.join(taskRoot,"progs"),
-            "data": os.path.join(taskRoot,"output",self.task),
-            "data_source": os.path.join(taskRoot,"raw"),
-            "binary_data": os.path.join(taskRoot,"output",self.task,"bin"),
-            "binary": os.path.join(taskRoot,"output",self.task,"bin")
-        }
-        if(dirCreate):
+        root = getTaskRoot(check=False)
+        if self._paths is None or self._paths[0] != root:
+            taskPaths = _taskPaths(getTaskRoot(),self.sponsor,self.project,
+                                   self.package,self.task)
+            self._paths = (root, taskPaths)
+        taskPaths = self._paths[1]
+        if dirCreate and not self._readOnly:
             for path in taskPaths.values():
-                Path(path).mkdir(parents=True,exist_ok=True)
-        return taskPaths
+                _makeDir(path)
+        return dict(taskPaths)
+    # -------------------------------------
+    def clearPathCache(self):
+        """Clear the cached paths for the task directories, and forget that the task directories exist so that they are created again when needed, and the files listed in the task directories (see clearDirCache)."""
+        if self._paths is not None:
+            prefixes = tuple(self._paths[1].values())
+            # Iterate over a copy, made atomically, since other threads may add directories.
+            for path in [p for p in _D4TAlinkKnownDirs.copy() if p.startswith(prefixes)]:
+                _D4TAlinkKnownDirs.discard(path)
+            _forgetDirFiles(prefixes)
+        self._paths = None
     # -------------------------------------
     def getTaskFilepath(self,type,ext,dirtype,subdir=None,dirCreate=True):
-        """Get the file path for a task file. The file path is constructed from the task directories, the file type, and the file extension. The file path is returned as a string. The file path is created if the dirCreate parameter is set to True.
+        """Get the file path for a task file. The file path is constructed from the task directories, the file type, and the file extension. The file path is returned as a string. The file path is created if the dirCreate parameter is set to True, unless the task is read-only.
 
         Attributes:
         type (str): The type of the file.
@@ -179,8 +652,8 @@ class Task:
         path = pz[dirtype]
         if not subdir is None:
             path = os.path.join(path,subdir)
-        if dirCreate:
-            Path(path).mkdir(parents=True,exist_ok=True)
+        if dirCreate and not self._readOnly:
+            _makeDir(path)
         fn = os.path.join(path,f"{self.task}_{type}.{ext}")
         return fn
     # -------------------------------------
@@ -282,104 +755,785 @@ class Task:
         """
         return Path(self.getTaskFilepath("a","a","data_source",subdir,dirCreate)).parent.absolute()
     # -------------------------------------
-    def saveBinary(self,obj,type,subdir=None):
-        """Save a binary object to a file. The object is saved to a binary file. The file path is constructed from the task directories, the file type, and the file extension. The file path is created if it does not exist. The object is saved to the file using the pickle module.
+    @_instrumented
+    def saveBinary(self,obj,type,subdir=None,dedup=False,outOfBand=False,threshold=65536,
+                   compression=None,level=None):
+        """Save a binary object to a file. The object is saved to a binary file. The file path is constructed from the task directories, the file type, and the file extension. The file path is created if it does not exist. The object is saved to the file using the pickle module. If the dedup parameter is set to True, the file is saved through the content-addressed blob store of the task root: each distinct content is stored once, the file is a hard link to it, and saving an unchanged object writes nothing. If the outOfBand parameter is set to True, the object is pickled with protocol 5, and the pickle stream and the data buffers of at least threshold bytes (e.g. NumPy arrays and the columns of DataFrames), written without copy, are saved together to a '.pkb' container file instead of the '.pkl' file, from which readBinary can memory-map the buffers. If a compression codec is specified, the object is pickled through the codec as a stream, and the codec extension is added to the file name; see listCodecs for the available codecs and benchmarkCodecs to choose one.
         
         Attributes:
         obj (object): The object to save.
         type (str): The type of the file.
         subdir (str): The subdirectory for the file (optional).
+        dedup (bool): A flag to save the file through the content-addressed blob store.
+        outOfBand (bool): A flag to save the large buffers out-of-band, to a container file.
+        threshold (int): The minimum size in bytes of the buffers saved out-of-band.
+        compression (str): The compression codec (optional).
+        level (int): The compression level (optional).
 
         Returns:
         str: The file path for the binary file.
         """
-        fn = self.binaryFn(type,"pkl",subdir)
-        with open(fn,"wb") as fp:
-            pickle.dump(obj,fp)
-        return fn
+        if compression is not None and outOfBand:
+            raise ValueError("Out-of-band buffers cannot be compressed.")
+        if outOfBand:
+            ext = "pkb"
+        else:
+            ext = "pkl" if compression is None else f"pkl.{_codec(compression)['ext']}"
+        fn = self.binaryFn(type,ext,subdir)
+        _removeVariants(fn,ext,["pkb","pkl"] + [f"pkl.{v['ext']}" for v in _D4TAlinkCodecs.values()])
+        if outOfBand:
+            buffers = []
+            def callback(b):
+                if b.raw().nbytes < threshold:
+                    return True
+                buffers.append(b)
+                return False
+            data = pickle.dumps(obj,protocol=5,buffer_callback=callback)
+            def write(path):
+                with open(path,"wb") as fp:
+                    _writePickleContainer(fp,data,buffers)
+            return _writeArtifact(fn,write,lambda fp: _writePickleContainer(fp,data,buffers),dedup)
+        def write(path):
+            with _codecOpen(path,"wb",compression,level) as fp:
+                pickle.dump(obj,fp)
+        stream = (lambda fp: pickle.dump(obj,fp)) if compression is None else None
+        return _writeArtifact(fn,write,stream,dedup)
     # -------------------------------------
-    def readBinary(self,type,subdir=None):
-        """Load a binary object from a file. The object is loaded from a binary file. The file path is constructed from the task directories, the file type, and the file extension. The object is loaded from the file using the pickle module. The object is returned.
+    @_instrumented
+    def readBinary(self,type,subdir=None,memoryMap=True,compression=None):
+        """Load a binary object from a file. The object is loaded from a binary file. The file path is constructed from the task directories, the file type, and the file extension. The object is loaded from the file using the pickle module. The object is returned. If the object was saved with out-of-band buffers, it is loaded from its container file, and the buffers are memory-mapped, unless the memoryMap parameter is set to False: loading is then almost free until the data is used, and processes loading the same object share its memory, but the arrays are read-only. If the compression codec is not specified, it is detected from the file extension, or from the first bytes of the file.
         
         Attributes:
         type (str): The type of the file.
         subdir (str): The subdirectory for the file (optional).
+        memoryMap (bool): A flag to memory-map the out-of-band buffers.
+        compression (str): The compression codec (optional).
         
         Returns:
         object: The object loaded from the file.
         """
-        fn = self.binaryFn(type,"pkl",subdir)
-        with open(fn,"rb") as fp:
-            obj = pickle.load(fp)
-        return obj
+        fn = self.binaryFn(type,"pkl",subdir,dirCreate=False)
+        bfn = self.binaryFn(type,"pkb",subdir,dirCreate=False)
+        if compression is not None:
+            files = [(f"{fn}.{_codec(compression)['ext']}",compression)]
+        else:
+            files = [(fn,None),(bfn,None)] + [(f"{fn}.{v['ext']}",c) for (c,v) in _D4TAlinkCodecs.items()]
+        (found,source) = self._locate([f for (f,_) in files])
+        (fn,compression) = next((f for f in files if f[0] == found),files[0])
+        if fn == bfn:
+            path = source.localPath(bfn)
+            if path is not None:
+                sections = _readPickleContainer(path,memoryMap)
+            else:
+                sections = _readPickleContainer(bfn,memoryMap,source.buffer(bfn))
+            _traceFile(bfn)
+            return pickle.loads(sections[0],buffers=sections[1:])
+        if compression is None:
+            _traceFile(fn)
+            with source.open(fn) as fp:
+                compression = _magicCodec(fp.peek(16))
+                if compression is None:
+                    return pickle.load(fp)
+        _traceFile(fn)
+        path = source.localPath(fn)
+        if path is not None:
+            with _codecOpen(path,"rb",compression) as fp:
+                return pickle.load(fp)
+        with source.open(fn) as mp, _codecOpen(mp,"rb",compression) as fp:
+            return pickle.load(fp)
+    # -------------------------------------
+    @_instrumented
+    def saveTable(self,df,type,subdir=None,format="parquet",compression=None,rowGroupSize=None,dedup=False):
+        """Save a DataFrame or a dictionary of DataFrames to a columnar binary file. The DataFrame is saved to a parquet or feather file in the binary directory. A dictionary of DataFrames is saved to one file per DataFrame, named after the file type and the dictionary key, together with a JSON index file, '<task>_<type>.tables.json', under a file lock (see fileLock). The file path is created if it does not exist. The files of the previous save of the same type that are not written again, e.g. in the other format or for a key no longer in the dictionary, are removed. By default, parquet files are compressed with snappy and feather files are not compressed, so that they can be memory-mapped.
+
+        Attributes:
+        df (DataFrame or Dict): The DataFrame(s) to save.
+        type (str): The type of the file.
+        subdir (str): The subdirectory for the file (optional).
+        format (str): The file format, 'parquet' or 'feather'.
+        compression (str): The compression codec (optional).
+        rowGroupSize (int): The maximum number of rows per parquet row group (optional).
+        dedup (bool): A flag to save the files through the content-addressed blob store.
+
+        Returns:
+        str: The file path for the binary file, or for the index file for a dictionary.
+        """
+        if format not in ("parquet","feather"):
+            raise ValueError(f"Table format '{format}' not recognized.")
+        pa = _importArrow()
+        def write(v,fn):
+            tb = pa.Table.from_pandas(v)
+            if format == "parquet":
+                _writeArtifact(fn,lambda path: pa.parquet.write_table(
+                    tb,path,compression=compression or "snappy",row_group_size=rowGroupSize),
+                               dedup=dedup)
+            else:
+                _writeArtifact(fn,lambda path: pa.feather.write_feather(
+                    tb,path,compression=compression or "uncompressed"),dedup=dedup)
+        storage = getTaskStorage()
+        fns = {f: self.binaryFn(type,f,subdir) for f in ("parquet","feather")}
+        fn = fns[format]
+        ifn = self.binaryFn(type,"tables.json",subdir)
+        import pandas as pd
+        if not isinstance(df, (pd.DataFrame, dict)):
+            raise TypeError("The table must be a DataFrame or a dictionary of DataFrames.")
+        with fileLock(ifn):
+            previous = set()
+            if storage.exists(ifn):
+                with storage.open(ifn) as fp:
+                    previous = {os.path.join(os.path.dirname(ifn),f) for f in json.load(fp)["tables"].values()}
+            if isinstance(df, pd.DataFrame):
+                write(df,fn)
+                stale = previous | {ifn}
+            else:
+                tables = {}
+                for (k,v) in df.items():
+                    tfn = self.binaryFn([type,k],format,subdir)
+                    write(v,tfn)
+                    tables[k] = os.path.basename(tfn)
+                _writeJson(ifn,{"format": format, "tables": tables})
+                stale = (previous - {os.path.join(os.path.dirname(ifn),f) for f in tables.values()}) | {fn}
+                fn = ifn
+            stale |= {f for f in fns.values() if f != fns[format]}
+            _removeArtifacts([f for f in sorted(stale) if storage.exists(f)])
+        return fn
     # -------------------------------------
-    def saveReportXls(self,df,type,subdir=None):
-        """Save a DataFrame to a report file. The DataFrame is saved to an Excel file. The file path is constructed from the task directories, the file type, and the file extension. The file path is created if it does not exist. The DataFrame is saved to the file using the to_excel method.
+    @_instrumented
+    def readTable(self,type,subdir=None,columns=None,filters=None,tables=None,memoryMap=False,arrow=False):
+        """Load a DataFrame or a dictionary of DataFrames from a columnar binary file. The file format (parquet or feather) is detected from the files in the binary directory. Only the requested columns and the rows matching the filters are loaded; for parquet files, the filters are also used to skip row groups. The filters are given in the pyarrow format, e.g. [("site", "==", "001"), ("visit", "in", [1, 2])]. If the memoryMap parameter is set to True, the file is memory-mapped instead of read, which is zero-copy for uncompressed feather files when the arrow parameter is also set to True.
+
+        Attributes:
+        type (str): The type of the file.
+        subdir (str): The subdirectory for the file (optional).
+        columns (list): The columns to load (optional).
+        filters (list): The row filters (optional).
+        tables (list): The keys of the DataFrames to load from a dictionary (optional).
+        memoryMap (bool): A flag to memory-map the file.
+        arrow (bool): A flag to return pyarrow Tables instead of DataFrames.
+
+        Returns:
+        DataFrame: The DataFrame or Dict of DataFrames loaded from the file.
+        """
+        pa = _importArrow()
+        def read(fn,format,source):
+            _traceFile(fn)
+            path = source.localPath(fn)
+            if path is None:
+                path = pa.BufferReader(pa.py_buffer(source.buffer(fn)))
+            if format == "parquet":
+                tb = pa.parquet.read_table(path,columns=columns,filters=filters,memory_map=memoryMap)
+            else:
+                tb = pa.feather.read_table(path,columns=None if filters else columns,
+                                           memory_map=memoryMap)
+                if filters:
+                    tb = tb.filter(pa.parquet.filters_to_expression(filters))
+                    if columns is not None:
+                        tb = tb.select(columns)
+            return tb if arrow else tb.to_pandas()
+        fns = {self.binaryFn(type,format,subdir,dirCreate=False): format
+               for format in ("parquet","feather")}
+        (fn,source) = self._locate(list(fns))
+        if fn is not None:
+            return read(fn,fns[fn],source)
+        (ifn,source) = self._locate([self.binaryFn(type,"tables.json",subdir,dirCreate=False)])
+        if ifn is None:
+            raise FileNotFoundError(f"Table '{type}' does not exist: '{list(fns)[-1]}'")
+        with source.open(ifn) as fp:
+            index = json.load(fp)
+        path = os.path.dirname(ifn)
+        keys = index["tables"].keys() if tables is None else tables
+        return {k: read(os.path.join(path,index["tables"][k]),index["format"],source) for k in keys}
+    # -------------------------------------
+    @_instrumented
+    def saveDataset(self,df,type,partitionBy,subdir=None,dirtype="binary",compression=None):
+        """Save a DataFrame to a partitioned dataset. The DataFrame is saved to a directory of parquet files in the binary or data directory, with one hive-style subdirectory per value of each partition column, e.g. 'site=001/visit=2/part-0.parquet', so that readDataset only reads the partitions matching its filters. The partition columns are stored in the directory names, not in the files. The dataset is written to a temporary directory which then replaces the previous dataset, so that a failed write leaves the previous dataset untouched. The row order is not preserved across partitions.
+
+        Attributes:
+        df (DataFrame): The DataFrame to save.
+        type (str): The type of the dataset.
+        partitionBy (list): The partition columns.
+        subdir (str): The subdirectory for the dataset (optional).
+        dirtype (str): The type of the directory, 'binary' or 'data'.
+        compression (str): The parquet compression codec; snappy by default (optional).
+
+        Returns:
+        str: The directory of the dataset.
+        """
+        if dirtype not in ("binary","data"):
+            raise ValueError(f"Dataset directory type '{dirtype}' not recognized.")
+        self._checkLocal("A partitioned dataset")
+        if isinstance(partitionBy, str):
+            partitionBy = [partitionBy]
+        pa = _importArrow()
+        tb = pa.Table.from_pandas(df,preserve_index=False)
+        for c in partitionBy:
+            field = tb.schema.field(c)
+            if pa.types.is_dictionary(field.type):
+                tb = tb.set_column(tb.schema.get_field_index(c),c,tb[c].cast(field.type.value_type))
+        # Each partition is contiguous, and so written to a single file.
+        tb = tb.sort_by([(c,"ascending") for c in partitionBy])
+        fn = self.getTaskFilepath(type,"dataset",dirtype,subdir)
+        (path,name) = os.path.split(fn)
+        tmp = os.path.join(path,f".{uuid.uuid4().hex[:12]}.{name}")
+        try:
+            partitioning = pa.dataset.partitioning(pa.schema([tb.schema.field(c) for c in partitionBy]),
+                                                   flavor="hive")
+            pa.dataset.write_dataset(tb,tmp,format="parquet",partitioning=partitioning,
+                                     basename_template="part-{i}.parquet",max_partitions=1 << 20,
+                                     file_options=pa.dataset.ParquetFileFormat().make_write_options(
+                                         compression=compression or "snappy"))
+            schema = tb.schema.with_metadata({**(tb.schema.metadata or {}),
+                                              b"d4talink.partitionBy": json.dumps(partitionBy).encode()})
+            pa.parquet.write_metadata(schema,os.path.join(tmp,"_common_metadata"))
+            removed = []
+            if os.path.exists(fn):
+                old = os.path.join(path,f".{uuid.uuid4().hex[:12]}.{name}")
+                os.replace(fn,old)
+                os.replace(tmp,fn)
+                removed = [os.path.join(fn,os.path.relpath(os.path.join(p,f),old))
+                           for (p,_,files) in os.walk(old) for f in files]
+                shutil.rmtree(old,ignore_errors=True)
+            else:
+                os.replace(tmp,fn)
+        finally:
+            shutil.rmtree(tmp,ignore_errors=True)
+        files = [os.path.join(p,f) for (p,_,files) in os.walk(fn) for f in files]
+        kept = set(files)
+        _removeArtifacts([f for f in removed if f not in kept])
+        _recordArtifacts(files)
+        _traceFile(fn)
+        return fn
+    # -------------------------------------
+    @_instrumented
+    def readDataset(self,type,filters=None,columns=None,subdir=None,dirtype="binary",parallel=True,arrow=False):
+        """Load a DataFrame from a partitioned dataset saved by saveDataset. Only the partition directories matching the filters are listed and read, and the filters are also used to skip the parquet row groups and rows that do not match. The filters are given in the pyarrow format, e.g. [("site", "==", "001"), ("visit", "in", [1, 2])]; the partitions are only pruned for a list of (column, operator, value) tuples. The files are read in parallel by the pyarrow thread pool unless the parallel parameter is set to False.
+
+        Attributes:
+        type (str): The type of the dataset.
+        filters (list): The row filters (optional).
+        columns (list): The columns to load (optional).
+        subdir (str): The subdirectory for the dataset (optional).
+        dirtype (str): The type of the directory, 'binary' or 'data'.
+        parallel (bool): A flag to read the files in parallel.
+        arrow (bool): A flag to return a pyarrow Table instead of a DataFrame.
+
+        Returns:
+        DataFrame: The DataFrame loaded from the dataset.
+        """
+        self._checkLocal("A partitioned dataset")
+        pa = _importArrow()
+        fn = self.getTaskFilepath(type,"dataset",dirtype,subdir,dirCreate=False)
+        try:
+            schema = pa.parquet.read_schema(os.path.join(fn,"_common_metadata"))
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Dataset '{type}' does not exist: '{fn}'")
+        partitionBy = json.loads(schema.metadata[b"d4talink.partitionBy"])
+        fields = [schema.field(c) for c in partitionBy]
+        files = _partitionFiles(pa,fn,fields,filters)
+        for f in files:
+            _traceFile(f)
+        ds = pa.dataset.dataset(files,schema=schema,format="parquet",partition_base_dir=fn,
+                                partitioning=pa.dataset.partitioning(pa.schema(fields),flavor="hive"))
+        tb = ds.to_table(columns=columns,use_threads=parallel,
+                         filter=pa.parquet.filters_to_expression(filters) if filters else None)
+        if not arrow:
+            return tb.to_pandas()
+        return tb
+    # -------------------------------------
+    @_instrumented
+    def saveReportXls(self,df,type,subdir=None,constantMemory=False,quiet=False,dedup=False):
+        """Save a DataFrame to a report file. The DataFrame is saved to an Excel file. The file path is constructed from the task directories, the file type, and the file extension. The file path is created if it does not exist. The DataFrame is saved to the file using the to_excel method. If the constantMemory parameter is set to True, the rows are written one at a time with xlsxwriter's constant_memory mode, which keeps the memory used independent of the size of the worksheets. The file path is logged with the 'D4TAlink' logger, at the INFO level, unless the quiet parameter is set to True.
         
         Attributes:
         df (DataFrame or Dict): The DataFrame(s) to save.
         type (str): The type of the file.
         subdir (str): The subdirectory for the file (optional).
+        constantMemory (bool): A flag to write the rows in constant memory mode.
+        quiet (bool): A flag to not log the file path.
+        dedup (bool): A flag to save the file through the content-addressed blob store.
 
         Returns:
         str: The file path for the Excel file.
         """
         fn = self.reportFn(type,"xlsx",subdir)
-        print(fn)
-        if isinstance(df, pd.DataFrame):
-            df.to_excel(fn,sheet_name='worksheet',index=False)
-        elif isinstance(df, dict):
-            with pd.ExcelWriter(fn, engine='xlsxwriter') as writer:
-                for (k,v) in df.items():
-                    v.to_excel(writer,sheet_name=k,index=False)
-                #writer.save()
-        return fn
+        if not quiet:
+            _log.info(fn)
+        return _writeArtifact(fn,lambda path: _writeXlsx(path,df,constantMemory),dedup=dedup)
+    # -------------------------------------
+    @_instrumented
+    def saveReports(self,tables,type,subdir=None,formats=("xlsx",),splitXlsx=False,
+                    constantMemory=False,workers=None,quiet=True):
+        """Save a dictionary of DataFrames to report files concurrently. For the 'xlsx' format, the DataFrames are saved as worksheets of a single Excel file, or to one Excel file per DataFrame if the splitXlsx parameter is set to True. For the 'csv' and 'parquet' formats, each DataFrame is saved to its own file, named after the file type and the dictionary key. The files are written in a pool of worker processes, the largest first; since the DataFrames are sent to the workers, the gain is largest when rendering dominates, as for Excel files. If the number of workers is set to 1, the files are written in the current process. The time taken by each file is logged with the 'D4TAlink' logger unless the quiet parameter is set to True, and is returned.
+
+        Attributes:
+        tables (dict): The DataFrames to save.
+        type (str): The type of the files.
+        subdir (str): The subdirectory for the files (optional).
+        formats (list): The formats, among 'xlsx', 'csv' and 'parquet'.
+        splitXlsx (bool): A flag to save one Excel file per DataFrame.
+        constantMemory (bool): A flag to write the Excel rows in constant memory mode.
+        workers (int): The maximum number of worker processes (optional).
+        quiet (bool): A flag to not log the timings.
+
+        Returns:
+        DataFrame: The table, format, file path, number of rows and time in seconds of each file written.
+        """
+        jobs = []
+        for format in formats:
+            if format not in ("xlsx","csv","parquet"):
+                raise ValueError(f"Report format '{format}' not recognized.")
+            if format == "xlsx" and not splitXlsx:
+                rows = sum(len(v) for v in tables.values())
+                jobs.append((None,format,self.reportFn(type,format,subdir),tables,rows))
+            else:
+                for (k,v) in tables.items():
+                    jobs.append((k,format,self.reportFn([type,k],format,subdir),
+                                 {k: v} if format == "xlsx" else v,len(v)))
+        jobs.sort(key=lambda job: -job[4])
+        storage = getTaskStorage()
+        if workers == 1 or not storage.local:
+            seconds = [_writeReportJob(f,fn,df,constantMemory) for (_,f,fn,df,_) in jobs]
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_writeReportJob,f,fn,df,constantMemory,getTaskFsync())
+                           for (_,f,fn,df,_) in jobs]
+                seconds = [future.result() for future in futures]
+            for job in jobs:
+                storage.commit(job[2])
+        if storage.local:
+            _recordArtifacts([job[2] for job in jobs])
+        for job in jobs:
+            _traceFile(job[2])
+        import pandas as pd
+        timings = pd.DataFrame({"table": [job[0] for job in jobs],
+                                "format": [job[1] for job in jobs],
+                                "file": [job[2] for job in jobs],
+                                "rows": [job[4] for job in jobs],
+                                "seconds": seconds})
+        if not quiet:
+            for row in timings.itertuples():
+                _log.info(f"{row.file}: {row.rows} rows in {row.seconds:.3f}s")
+        return timings
     # -------------------------------------
-    def readReportXls(self,type,subdir=None):
-        """Load a DataFrame from a report file. The DataFrame is loaded from an Excel file. The file path is constructed from the task directories, the file type, and the file extension. The DataFrame is loaded from the file using the read_excel method. The DataFrame is returned.
+    @_instrumented
+    def readReportXls(self,type,subdir=None,sheet=None,lazy=False,cache=False):
+        """Load a DataFrame from a report file. The DataFrame is loaded from an Excel file. The file path is constructed from the task directories, the file type, and the file extension. The DataFrame is loaded from the file using the read_excel method. The DataFrame is returned. If a worksheet name is given, only that worksheet is parsed and its DataFrame is returned; if a list of worksheet names is given, only these worksheets are parsed. If the lazy parameter is set to True, a read-only mapping is returned, in which each worksheet is parsed on first access; the mapping keeps the file open until its close method is called, or until the end of a with block. If the cache parameter is set to True, the parsed worksheets are cached in the '.d4talink' directory of the task root, and reused as long as the mtime and size of the Excel file do not change. The Excel files read from a task archive or from a storage backend without local files are not cached.
         
         Attributes:
         type (str): The type of the file.
         subdir (str): The subdirectory for the file (optional).
+        sheet (str or list): The worksheet(s) to load (optional).
+        lazy (bool): A flag to parse the worksheets on first access.
+        cache (bool): A flag to cache the parsed worksheets.
         
         Returns:
         DataFrame: The DataFrame or Dict of DataFrames loaded from the file.
         """
-        fn = self.reportFn(type,"xlsx",subdir)
-        df = pd.read_excel(fn,sheet_name=None)
+        fn = self.reportFn(type,"xlsx",subdir,dirCreate=False)
+        source = self._excelSource(fn)
+        _traceFile(fn)
+        if not lazy and not cache:
+            import pandas as pd
+            return pd.read_excel(source,sheet_name=sheet)
+        cacheDir = None
+        if cache and isinstance(source, str):
+            cacheDir = os.path.join(getTaskRoot(),".d4talink","cache","xls",
+                                    hashlib.sha1(os.path.abspath(fn).encode()).hexdigest())
+        sheets = _ExcelSheets(source,cacheDir)
+        if lazy:
+            return sheets
+        try:
+            if isinstance(sheet, str):
+                df = sheets[sheet]
+            else:
+                df = {k: sheets[k] for k in (sheets if sheet is None else sheet)}
+        finally:
+            sheets.close()
         return df
     # -------------------------------------
-    def saveReportCsv(self,df,type,subdir=None,sep=",",encoding="utf-8"):
-        """Save a DataFrame to a report file. The DataFrame is saved to a CSV file. The file path is constructed from the task directories, the file type, and the file extension. The file path is created if it does not exist. The DataFrame is saved to the file using the to_csv method.
+    def iterReportXls(self,type,sheet=None,subdir=None):
+        """Iterate over the rows of a worksheet of a report file. The Excel file is read in streaming read-only mode, so that the memory used does not depend on the size of the worksheet. The rows are returned as tuples of cell values; the first row contains the column names.
         
         Attributes:
-        df (DataFrame): The DataFrame to save.
+        type (str): The type of the file.
+        sheet (str): The worksheet to read; the first worksheet by default (optional).
+        subdir (str): The subdirectory for the file (optional).
+        
+        Returns:
+        iterator: The rows of the worksheet.
+        """
+        import openpyxl
+        fn = self.reportFn(type,"xlsx",subdir,dirCreate=False)
+        wb = openpyxl.load_workbook(self._excelSource(fn),read_only=True,data_only=True)
+        try:
+            ws = wb.worksheets[0] if sheet is None else wb[sheet]
+            for row in ws.iter_rows(values_only=True):
+                yield row
+        finally:
+            wb.close()
+    # -------------------------------------
+    @_instrumented
+    def saveReportCsv(self,df,type,subdir=None,sep=",",encoding="utf-8",compression=None,dedup=False):
+        """Save a DataFrame to a report file. The DataFrame is saved to a CSV file. The file path is constructed from the task directories, the file type, and the file extension. The file path is created if it does not exist. The DataFrame is saved to the file using the to_csv method. The DataFrame can also be given as an iterator of DataFrames, which are appended to the file one chunk at a time below a single header, so that the whole table never has to be held in memory. If a compression is specified, the file is compressed and the compression extension is added to the file name.
+        
+        Attributes:
+        df (DataFrame or iterator): The DataFrame, or the DataFrame chunks, to save.
         type (str): The type of the file.
         subdir (str): The subdirectory for the file (optional).
         sep (str): The separator for the CSV file.
         encoding (str): The encoding for the CSV file.
+        compression (str): The compression, 'gzip', 'bz2' or 'xz' (optional).
+        dedup (bool): A flag to save the file through the content-addressed blob store.
 
         Returns:
         str: The file path for the CSV file.
         """
-        fn = self.reportFn(type,"csv",subdir)
-        df.to_csv(fn,index=False,sep=sep,encoding=encoding)
+        if compression not in _CSV_COMPRESSION:
+            raise ValueError(f"CSV compression '{compression}' not recognized.")
+        (ext,opener) = _CSV_COMPRESSION[compression]
+        fn = self.reportFn(type,ext,subdir)
+        import pandas as pd
+        chunks = [df] if isinstance(df, pd.DataFrame) else df
+        def write(path):
+            with opener(path,"wt",encoding=encoding,newline="") as fp:
+                header = True
+                for chunk in chunks:
+                    chunk.to_csv(fp,index=False,sep=sep,header=header)
+                    header = False
+        _writeArtifact(fn,write,dedup=dedup)
+        _removeVariants(fn,ext,[kext for (kext,_) in _CSV_COMPRESSION.values()])
         return fn
     # -------------------------------------
-    def readReportCsv(self,type,subdir=None,sep=",",encoding="utf-8"):
-        """Load a DataFrame from a report file. The DataFrame is loaded from a CSV file. The file path is constructed from the task directories, the file type, and the file extension. The DataFrame is loaded from the file using the read_csv method. The DataFrame is returned.
+    @_instrumented
+    def readReportCsv(self,type,subdir=None,sep=",",encoding="utf-8",compression=None,
+                      chunksize=None,usecols=None,dtype=None):
+        """Load a DataFrame from a report file. The DataFrame is loaded from a CSV file. The file path is constructed from the task directories, the file type, and the file extension. The DataFrame is loaded from the file using the read_csv method. The DataFrame is returned. If the compression is not specified, it is detected from the files present. If the chunksize parameter is set, an iterator of DataFrames with at most chunksize rows each is returned instead, so that the file can be processed with bounded memory.
         
         Attributes:
         type (str): The type of the file.
         subdir (str): The subdirectory for the file (optional).
         sep (str): The separator for the CSV file.
         encoding (str): The encoding for the CSV file.
+        compression (str): The compression, 'gzip', 'bz2' or 'xz' (optional).
+        chunksize (int): The number of rows per chunk (optional).
+        usecols (list): The columns to load (optional).
+        dtype (dict): The data types of the columns (optional).
         
         Returns:
-        DataFrame: The DataFrame loaded from the file.
+        DataFrame: The DataFrame loaded from the file, or an iterator of DataFrames.
         """
-        fn = self.reportFn(type,"csv",subdir)
-        df = pd.read_csv(fn,sep=sep,encoding=encoding)
-        return df
-# -------------------------------------------------------------------------------
+        if compression is None:
+            files = [(self.reportFn(type,ext,subdir,dirCreate=False),c)
+                     for (c,(ext,_)) in _CSV_COMPRESSION.items()]
+        elif compression in _CSV_COMPRESSION:
+            files = [(self.reportFn(type,_CSV_COMPRESSION[compression][0],subdir,dirCreate=False),compression)]
+        else:
+            raise ValueError(f"CSV compression '{compression}' not recognized.")
+        (found,source) = self._locate([f for (f,_) in files])
+        (fn,compression) = next((f for f in files if f[0] == found),files[0])
+        _traceFile(fn)
+        path = source.localPath(fn)
+        import pandas as pd
+        def read(f):
+            return pd.read_csv(f,sep=sep,encoding=encoding,chunksize=chunksize,
+                               usecols=usecols,dtype=dtype,compression=compression)
+        if path is not None:
+            return read(path)
+        fp = source.open(fn)
+        if chunksize is None:
+            with fp:
+                return read(fp)
+        # The reader does not close a file object it did not open: close it with the reader,
+        # i.e. at the end of the iteration, at the end of a with block, or by its close method.
+        reader = read(fp)
+        close = reader.close
+        def closeAll():
+            close()
+            fp.close()
+        reader.close = closeAll
+        return reader
+    # -------------------------------------
+    def cached(self,name,maxEntries=None,maxBytes=None,compression=None):
+        """Get a decorator caching the results of a function in the task. The results are keyed on a hash of the bytecode of the function and of its arguments, and saved as binary files in the 'cache' subdirectory of the binary directory, with an index of their sizes, last use, and of the hits and misses of each cache name. A call with the same arguments, to an unchanged function, returns the saved result without calling the function; changing the function or its default arguments invalidates its results. Changes to the functions it calls are not detected, and a new Python version invalidates all results. The arguments must be picklable. When the cache holds more than maxEntries results or maxBytes bytes for the name, the least recently used results are evicted; see also pruneTaskCaches to bound the caches of the whole repository. A read-only task returns the saved results but does not save new ones.
+
+        Attributes:
+        name (str): The name of the cache, e.g. 'fitModel'.
+        maxEntries (int): The maximum number of results kept for the name (optional).
+        maxBytes (int): The maximum size in bytes of the results kept for the name (optional).
+        compression (str): The compression codec of the saved results (optional).
+
+        Returns:
+        function: The decorator.
+        """
+        self._checkLocal("The result cache")
+        def decorator(f):
+            @functools.wraps(f)
+            def wrapper(*args,**kwargs):
+                key = _cacheKey(name,f,args,kwargs)
+                type = [name,key[:24]]
+                ifn = self.binaryFn(_CACHE_SUBDIR,"json",_CACHE_SUBDIR,dirCreate=False)
+                entry = _readCacheIndex(ifn)["entries"].get(key)
+                hit = False
+                if entry is not None:
+                    try:
+                        value = self.readBinary(type,_CACHE_SUBDIR,compression=entry["compression"])
+                        hit = True
+                    except (OSError, EOFError, pickle.UnpicklingError):
+                        pass
+                if not hit:
+                    value = f(*args,**kwargs)
+                if self._readOnly:
+                    return value
+                if not hit:
+                    fn = self.saveBinary(value,type,_CACHE_SUBDIR,compression=compression)
+                with _D4TAlinkCacheLock, fileLock(ifn):
+                    idx = _readCacheIndex(ifn)
+                    stats = idx["stats"].setdefault(name,{"hits": 0, "misses": 0})
+                    now = datetime.now().isoformat()
+                    if hit:
+                        stats["hits"] += 1
+                        if key in idx["entries"]:
+                            idx["entries"][key]["used"] = now
+                            idx["entries"][key]["hits"] += 1
+                    else:
+                        stats["misses"] += 1
+                        idx["entries"][key] = {"name": name, "file": os.path.basename(fn),
+                                               "compression": compression,
+                                               "bytes": os.path.getsize(fn),
+                                               "created": now, "used": now, "hits": 0}
+                        _evictCache(os.path.dirname(ifn),idx,name,maxEntries,maxBytes)
+                    _writeCacheIndex(ifn,idx)
+                return value
+            return wrapper
+        return decorator
+    # -------------------------------------
+    def cacheInfo(self):
+        """Get the content of the result cache of the task (see cached): number of results, size in bytes, hits and misses of each cache name.
+
+        Returns:
+        DataFrame: The cache name, number of results, size in bytes, hits and misses.
+        """
+        import pandas as pd
+        ifn = self.binaryFn(_CACHE_SUBDIR,"json",_CACHE_SUBDIR,dirCreate=False)
+        idx = _readCacheIndex(ifn)
+        rows = {name: {"name": name, "entries": 0, "bytes": 0, **v} for (name,v) in idx["stats"].items()}
+        for e in idx["entries"].values():
+            row = rows.setdefault(e["name"],{"name": e["name"], "entries": 0, "bytes": 0,
+                                             "hits": 0, "misses": 0})
+            row["entries"] += 1
+            row["bytes"] += e["bytes"]
+        return pd.DataFrame(list(rows.values()),columns=["name","entries","bytes","hits","misses"])
+    # -------------------------------------
+    def clearCache(self,name=None):
+        """Remove the results of the result cache of the task (see cached), with their hit and miss counts.
+
+        Attributes:
+        name (str): The cache name whose results are removed; all names by default (optional).
 
+        Returns:
+        int: The number of bytes freed.
+        """
+        ifn = self.binaryFn(_CACHE_SUBDIR,"json",_CACHE_SUBDIR,dirCreate=False)
+        if not os.path.exists(ifn):
+            return 0
+        freed = 0
+        with _D4TAlinkCacheLock, fileLock(ifn):
+            idx = _readCacheIndex(ifn)
+            for (key,e) in list(idx["entries"].items()):
+                if name is None or e["name"] == name:
+                    freed += _removeCacheEntry(os.path.dirname(ifn),idx,key)
+            for n in list(idx["stats"]):
+                if name is None or n == name:
+                    del idx["stats"][n]
+            _writeCacheIndex(ifn,idx)
+        return freed
+    # -------------------------------------
+    def _locate(self,fns):
+        """Locate the first existing file of a list of file paths: the files of the storage backend come first, then the members of the task archive (see pack), so that a file saved after packing shadows its packed version. The function returns the file path and its source, the storage backend or the archive, which both provide the exists, open, buffer and localPath methods; the file path is None if no file exists."""
+        storage = getTaskStorage()
+        for fn in fns:
+            if storage.exists(fn):
+                return (fn,storage)
+        afn = self.binaryFn("pack","zip",dirCreate=False)
+        if storage.local and storage.exists(afn):
+            pack = _openPack(storage.localPath(afn))
+            for fn in fns:
+                if pack is not None and pack.exists(fn):
+                    return (fn,pack)
+        return (None,storage)
+    def _excelSource(self,fn):
+        """Get the source of an Excel file: a local file path, or a file object of its content."""
+        (_,source) = self._locate([fn])
+        path = source.localPath(fn)
+        if path is not None:
+            return path
+        return io.BytesIO(source.buffer(fn))
+    def _checkLocal(self,feature):
+        """Check that the storage backend has local files, which a feature requires."""
+        _checkLocalStorage(feature)
+    # -------------------------------------
+    def _packFiles(self):
+        """List the files to pack, as (file path, member name) pairs: the files of the output directory tracked by the manifest, except the task file, the archive and the partitioned datasets, and the files of the task in the documentation and code directories."""
+        paths = self.getTaskPaths()
+        data = paths["data"]
+        root = os.path.dirname(os.path.dirname(data))
+        skip = {f"bin/{self.task}_task.json", f"bin/{self.task}_pack.zip"}
+        files = []
+        for (path,dirs,names) in os.walk(data):
+            dirs[:] = [d for d in dirs if not d.endswith(".dataset")]
+            for name in names:
+                rel = os.path.relpath(os.path.join(path,name),data).replace(os.sep,"/")
+                if rel not in skip and _tracked(data,self.task,rel):
+                    files.append(os.path.join(path,name))
+        # The files of the tasks whose name starts with this task name and an
+        # underscore have the same prefix, e.g. 'task_a_x.pdf' for 'task_a'.
+        try:
+            others = tuple(f"{t}_" for t in os.listdir(os.path.dirname(data))
+                           if t.startswith(f"{self.task}_"))
+        except FileNotFoundError:
+            others = ()
+        for dirtype in ("documentation","code"):
+            for (path,dirs,names) in os.walk(paths[dirtype]):
+                dirs[:] = [d for d in dirs if not d.startswith(".")]
+                files.extend(os.path.join(path,name) for name in names
+                             if name.startswith(f"{self.task}_") and not (others and name.startswith(others)))
+        return [(fn,os.path.relpath(fn,root).replace(os.sep,"/")) for fn in sorted(files)]
+    # -------------------------------------
+    def pack(self,compression=None,remove=True):
+        """Pack the files of the task into a single archive, '<task>_pack.zip' in the binary directory, e.g. to archive or move a finished task: copying one large file is much faster than copying many small ones, in particular on network storage. The archive holds the files of the output directory, except the task file, the manifest, the I/O sidecar, the result cache and the partitioned datasets, and the files of the task in the documentation and code directories; the data source directory is not packed. The archive is a ZIP file whose members are uncompressed by default, and aligned so that they can be memory-mapped: readBinary, readTable, readReportXls, iterReportXls and readReportCsv read the packed files transparently, seeking straight to their member without extracting it, and the out-of-band buffers of binary objects and uncompressed feather files are still memory-mapped. A file saved after packing takes precedence over its packed version. Packing a task again adds its new files to the archive. The compression parameter compresses the members with the 'deflate', 'bz2' or 'xz' codec of the ZIP format, except the files compressed already and the out-of-band buffers; compressed members are decompressed when read. If the remove parameter is set to True, the packed files written by the save methods, i.e. the files of the output directory recorded in the manifest, are removed; the files of the documentation and code directories, e.g. the analysis scripts, are never removed, nor are the files the task did not save. The mtime of the archive is that of its newest file, so that runTasks does not see the task as changed.
+
+        Attributes:
+        compression (str): The compression of the archive members (optional).
+        remove (bool): A flag to remove the packed files saved by the task.
+
+        Returns:
+        str: The file path for the archive.
+        """
+        self._checkLocal("Packing a task")
+        storage = getTaskStorage()
+        afn = self.binaryFn("pack","zip")
+        data = self.getTaskPaths()["data"]
+        prefix = f"output/{self.task}/"
+        with fileLock(afn):
+            files = self._packFiles()
+            previous = _openPack(storage.localPath(afn)) if storage.exists(afn) else None
+            recorded = _readManifest(_manifestPath(data,self.task))["files"]
+            index = {"task": self.task, "files": dict(previous.index["files"]) if previous else {}}
+            for (fn,name) in files:
+                st = os.stat(fn)
+                e = recorded.get(name[len(prefix):]) if name.startswith(prefix) else None
+                index["files"][name] = {"mtime": st.st_mtime_ns,
+                                        "sha256": e["sha256"] if e is not None and e["size"] == st.st_size and
+                                                  e["mtime"] == st.st_mtime_ns else None}
+            mtime = max((e["mtime"] for e in index["files"].values()),default=None)
+            _writeArtifact(afn,lambda path: _writePack(path,files,index,compression,previous,mtime))
+            if remove:
+                _removeArtifacts([fn for (fn,name) in files
+                                  if name.startswith(prefix) and name[len(prefix):] in recorded])
+        return afn
+    # -------------------------------------
+    def unpack(self,remove=True):
+        """Extract the files of the task from its archive (see pack), with their mtimes, and record them in the manifest of the task. The packed files saved again since the task was packed are not extracted, since the files on disk are newer. If the remove parameter is set to True, the archive is removed.
+
+        Attributes:
+        remove (bool): A flag to remove the archive.
+
+        Returns:
+        list: The file paths of the extracted files.
+        """
+        self._checkLocal("Unpacking a task")
+        storage = getTaskStorage()
+        afn = self.binaryFn("pack","zip",dirCreate=False)
+        with fileLock(afn):
+            pack = _openPack(storage.localPath(afn)) if storage.exists(afn) else None
+            if pack is None:
+                raise FileNotFoundError(f"Task '{self.task}' is not packed: '{afn}'")
+            fns = []
+            digests = []
+            for zi in pack.infos():
+                fn = os.path.join(pack.dir,*zi.filename.split("/"))
+                if storage.exists(fn):
+                    continue
+                e = pack.index["files"].get(zi.filename,{})
+                _makeDir(os.path.dirname(fn))
+                def write(path):
+                    with pack.open(zi) as src, open(path,"wb") as dst:
+                        shutil.copyfileobj(src,dst,1 << 20)
+                    if e.get("mtime") is not None:
+                        os.utime(path,ns=(e["mtime"],e["mtime"]))
+                storage.write(fn,write)
+                fns.append(fn)
+                digests.append(e.get("sha256"))
+            _recordArtifacts(fns,digests)
+            _forgetDirFiles((pack.dir,))
+            if remove:
+                _closePack(afn)
+                _removeArtifacts([afn])
+        return fns
+    # -------------------------------------
+    def submitWrite(self,method,*args,**kwargs):
+        """Queue a write of the task, to run in the background while the caller goes on. The writes of a task run one at a time, in the order they were submitted, on a thread of the task, with the configuration of the caller (see config); they are completed by flushWrites. The method is a method name of the task, e.g. 'saveBinary', or a function called with the task, and the other arguments are passed to it.
+
+        Attributes:
+        method (str or function): The write method of the task.
+        args (list): The arguments of the method.
+        kwargs (dict): The keyword arguments of the method.
+
+        Returns:
+        Future: The future result of the write.
+        """
+        f = getattr(self,method) if isinstance(method, str) else functools.partial(method,self)
+        if self._writes is None:
+            self._writes = (ThreadPoolExecutor(max_workers=1,thread_name_prefix="D4TAlink-write"),[])
+        future = self._writes[0].submit(contextvars.copy_context().run,f,*args,**kwargs)
+        self._writes[1].append(future)
+        return future
+    # -------------------------------------
+    def flushWrites(self):
+        """Wait for the writes queued by submitWrite to complete. If some writes failed, the exception of the first one is raised once all are completed.
+
+        Returns:
+        list: The results of the writes, in the order they were submitted.
+        """
+        if self._writes is None:
+            return []
+        (executor,futures) = self._writes
+        self._writes = None
+        executor.shutdown(wait=True)
+        for future in futures:
+            if future.exception() is not None:
+                raise future.exception()
+        return [future.result() for future in futures]
+    # -------------------------------------
+    async def asaveBinary(self,*args,**kwargs):
+        """Save a binary object to a file without blocking the event loop. The arguments are those of saveBinary, which runs on the executor set by setAsyncExecutor."""
+        return await _runAsync(self.saveBinary,*args,**kwargs)
+    async def areadBinary(self,*args,**kwargs):
+        """Load a binary object from a file without blocking the event loop. The arguments are those of readBinary, which runs on the executor set by setAsyncExecutor."""
+        return await _runAsync(self.readBinary,*args,**kwargs)
+    async def asaveTable(self,*args,**kwargs):
+        """Save a DataFrame to a columnar binary file without blocking the event loop. The arguments are those of saveTable, which runs on the executor set by setAsyncExecutor."""
+        return await _runAsync(self.saveTable,*args,**kwargs)
+    async def areadTable(self,*args,**kwargs):
+        """Load a DataFrame from a columnar binary file without blocking the event loop. The arguments are those of readTable, which runs on the executor set by setAsyncExecutor."""
+        return await _runAsync(self.readTable,*args,**kwargs)
+    async def asaveDataset(self,*args,**kwargs):
+        """Save a DataFrame to a partitioned dataset without blocking the event loop. The arguments are those of saveDataset, which runs on the executor set by setAsyncExecutor."""
+        return await _runAsync(self.saveDataset,*args,**kwargs)
+    async def areadDataset(self,*args,**kwargs):
+        """Load a DataFrame from a partitioned dataset without blocking the event loop. The arguments are those of readDataset, which runs on the executor set by setAsyncExecutor."""
+        return await _runAsync(self.readDataset,*args,**kwargs)
+    async def asaveReportXls(self,*args,**kwargs):
+        """Save a DataFrame to an Excel report file without blocking the event loop. The arguments are those of saveReportXls, which runs on the executor set by setAsyncExecutor."""
+        return await _runAsync(self.saveReportXls,*args,**kwargs)
+    async def areadReportXls(self,*args,**kwargs):
+        """Load a DataFrame from an Excel report file without blocking the event loop. The arguments are those of readReportXls, which runs on the executor set by setAsyncExecutor."""
+        return await _runAsync(self.readReportXls,*args,**kwargs)
+    async def asaveReportCsv(self,*args,**kwargs):
+        """Save a DataFrame to a CSV report file without blocking the event loop. The arguments are those of saveReportCsv, which runs on the executor set by setAsyncExecutor."""
+        return await _runAsync(self.saveReportCsv,*args,**kwargs)
+    async def areadReportCsv(self,*args,**kwargs):
+        """Load a DataFrame from a CSV report file without blocking the event loop. The arguments are those of readReportCsv, which runs on the executor set by setAsyncExecutor; when reading in chunks, only the opening of the file runs on the executor."""
+        return await _runAsync(self.readReportCsv,*args,**kwargs)
+# -------------------------------------------------------------------------------
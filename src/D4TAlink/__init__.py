@@ -1,5 +1,15 @@
 from .D4TAlinkPar import *
 from .D4TAlinkTask import *
+from .D4TAlinkCatalog import *
+from .D4TAlinkStore import *
+from .D4TAlinkCodec import *
+from .D4TAlinkAsync import *
+from .D4TAlinkInstrument import *
+from .D4TAlinkCache import *
+from .D4TAlinkScheduler import *
+from .D4TAlinkLock import *
+from .D4TAlinkManifest import *
+from .D4TAlinkStorage import *
 
 
 
@@ -25,11 +25,25 @@ task2 = D4.Task(project = "DiseaseABC",
                 taskname = "20220905_mySecondAnalysis")
 
 #4. List the tasks in repository
+tasks = D4.listTasks(project = "DiseaseABC", 
+                     package = "myStudy")
+assert list(tasks["task"]) == ["20220901_myFirstAnalysis", "20220905_mySecondAnalysis"]
+assert D4.refreshCatalog()["updated"] == 0
 
 # 5. Load a task from the repository 
 mytask = D4.loadTask(project = "DiseaseABC", 
                      package = "myStudy", 
                      taskname = "20220905_mySecondAnalysis")
+rotask = D4.loadTask(project = "DiseaseABC", 
+                     package = "myStudy", 
+                     taskname = "20220901_myFirstAnalysis",
+                     readOnly = True)
+assert not os.path.exists(rotask.reportDir("newdir"))
+tasks = D4.loadTasks([("DiseaseABC", "myStudy", "20220901_myFirstAnalysis"),
+                      ("DiseaseABC", "myStudy", "20220905_mySecondAnalysis"),
+                      ("DiseaseABC", "myStudy", "missing")], quiet = True)
+assert tasks[("myClient", "DiseaseABC", "myStudy", "missing")] is None
+assert tasks[("myClient", "DiseaseABC", "myStudy", "20220901_myFirstAnalysis")].author == "Doe Johns"
 
 # 6. Add data to a task
 d = {"letters" : pd.DataFrame({"a" : list(string.ascii_uppercase), 
@@ -43,12 +57,159 @@ mytask.saveBinary(d, "myTables")
 # 7. Load data from a task
 e  = mytask.readBinary("myTables")
 
+# 7a. Share identical data between tasks
+fn1 = mytask.saveBinary(d, "shared", dedup = True)
+fn2 = task1.saveBinary(d, "shared", dedup = True)
+assert os.path.samefile(fn1, fn2)
+
+# 7c. Save data with out-of-band buffers, and memory-map them back
+fn = mytask.saveBinary(d, "myTablesOOB", outOfBand = True, threshold = 0)
+e = mytask.readBinary("myTablesOOB")
+assert e["letters"].equals(d["letters"])
+assert fn.endswith(".pkb") and not os.path.exists(mytask.binaryFn("myTablesOOB", "pkl"))
+
+# 7d. Save compressed data
+fn = mytask.saveBinary(d, "myTablesXZ", compression = "xz")
+assert fn.endswith(".pkl.xz")
+e = mytask.readBinary("myTablesXZ")
+assert e["other"].equals(d["other"])
+
+# 7b. Add and load columnar tables
+mytask.saveTable(d, "myTables")
+f = mytask.readTable("myTables", columns = ["a"], filters = [("c", "<", 3)], tables = ["letters"])
+assert list(f["letters"]["a"]) == ["A", "B", "C"]
+mytask.saveTable(d["letters"], "letters", format = "feather")
+f = mytask.readTable("letters", memoryMap = True)
+assert f.equals(d["letters"])
+
+# 7e. Add and load a partitioned dataset
+letters = d["letters"].assign(group = d["letters"]["c"] % 3)
+mytask.saveDataset(letters, "letters", partitionBy = ["group"])
+f = mytask.readDataset("letters", filters = [("group", "==", 1), ("c", "<", 10)], columns = ["a"])
+assert list(f["a"]) == ["B", "E", "H"]
+assert len(mytask.readDataset("letters")) == 26
+
 # 8. Add reports to a task
 efn = mytask.saveReportXls(d, "tables")
+assert mytask.readReportXls("tables", sheet = "other").equals(d["other"])
+with mytask.readReportXls("tables", lazy = True, cache = True) as sheets:
+    assert list(sheets) == ["letters", "other"]
+    assert sheets["letters"].equals(d["letters"])
+assert next(mytask.iterReportXls("tables")) == ("a", "b", "c")
+efn = mytask.saveReportXls(d, "tablescm", constantMemory = True, quiet = True)
+assert mytask.readReportXls("tablescm", sheet = "letters").equals(d["letters"])
+timings = mytask.saveReports(d, "batch", formats = ["xlsx", "csv"], workers = 2)
+assert len(timings) == 3
 
 csvfile = mytask.saveReportCsv(d["letters"], "tables")
 print(csvfile)
 
+csvfile = mytask.saveReportCsv((d["letters"][i:i+10] for i in range(0, 26, 10)), 
+                               "chunks", compression = "gzip")
+n = sum(len(chunk) for chunk in mytask.readReportCsv("chunks", chunksize = 5))
+assert n == 26 and csvfile.endswith(".csv.gz")
+
+# 9. Asynchronous task I/O
+import asyncio
+async def asyncSteps():
+    atask = await D4.aloadTask(project = "DiseaseABC", 
+                               package = "myStudy", 
+                               taskname = "20220905_mySecondAnalysis")
+    await asyncio.gather(*[atask.asaveBinary(d, f"async{i}") for i in range(4)])
+    return await atask.areadBinary("async3")
+assert asyncio.run(asyncSteps())["other"].equals(d["other"])
+
+# 10. Instrument the task I/O
+stats = D4.addIOHook(D4.IOStats())
+mytask.saveBinary(d, "myTables")
+e = mytask.readBinary("myTables")
+D4.removeIOHook(stats)
+assert list(stats.summary()["op"]) == ["readBinary", "saveBinary"]
+
+# 10a. Cache the results of a computation
+calls = []
+@mytask.cached("letterCount", maxEntries = 2)
+def letterCount(df, column):
+    calls.append(column)
+    return df[column].str.len().sum()
+assert letterCount(d["letters"], "a") == letterCount(d["letters"], "a") == 26
+assert calls == ["a"]
+info = mytask.cacheInfo()
+assert list(info[["hits", "misses"]].iloc[0]) == [1, 1]
+assert mytask.clearCache("letterCount") > 0
+
+# 10b. Run the tasks in the order of their dependencies
+task2.setDependencies(["20220901_myFirstAnalysis"])
+run = lambda task: task.saveBinary(task.task, "name")
+report = D4.runTasks({"20220901_myFirstAnalysis": run, "20220905_mySecondAnalysis": run}, 
+                     project = "DiseaseABC", package = "myStudy", workers = 1, force = True, quiet = True)
+assert list(report["status"]) == ["run", "run"] and report["critical"].all()
+report = D4.runTasks({"20220901_myFirstAnalysis": run, "20220905_mySecondAnalysis": run}, 
+                     project = "DiseaseABC", package = "myStudy", workers = 1, quiet = True)
+assert list(report["status"]) == ["skipped", "skipped"]
+
+# 10c. Queue the writes of a task
+futures = [mytask.submitWrite("saveBinary", d[k], f"queued_{k}") for k in d]
+assert mytask.flushWrites() == [f.result() for f in futures]
+assert mytask.readBinary("queued_other").equals(d["other"])
+assert not [f for f in os.listdir(mytask.binaryDir()) if f.startswith(".")]
+
+# 10d. Work for another sponsor in a context-local configuration
+with D4.config(sponsor = "otherClient", author = "Roe Jane"):
+    otherTask = D4.Task(project = "DiseaseXYZ", package = "myStudy", taskname = "20220910_other")
+    assert otherTask.sponsor == "otherClient" and otherTask.author == "Roe Jane"
+    assert len(D4.listTasks(project = "DiseaseXYZ")) == 1
+assert D4.getTaskSponsor() == "myClient" and D4.getTaskAuthor() == "Doe Johns"
+assert len(D4.listTasks(project = "DiseaseXYZ")) == 0
+assert len(D4.listTasks(project = "DiseaseXYZ", allSponsors = True)) == 1
+
+# 10e. Verify the task files against their manifest
+report = D4.verifyTask(mytask, full = True)
+assert len(report) > 0 and (report["status"] == "ok").all()
+assert (D4.verifyRepository(project = "DiseaseABC")["status"] == "unchanged").all()
+
+# 10f. Pack the task files into a single archive, and read them back
+script = os.path.join(mytask.getTaskPaths()["code"], "20220905_mySecondAnalysis_main.py")
+with open(script, "w") as fp:
+    fp.write("print('analysis')\n")
+afn = mytask.pack()
+assert not os.path.exists(mytask.binaryFn("myTables", "pkl", dirCreate = False))
+assert os.path.exists(script)
+assert mytask.readBinary("myTablesOOB")["letters"].equals(d["letters"])
+assert mytask.readBinary("myTables")["other"].equals(d["other"])
+mytask.unpack()
+assert not os.path.exists(afn)
+assert (D4.verifyTask(mytask, full = True)["status"] == "ok").all()
+
+# 10g. Keep the task files in memory, or in a local cache written back to a remote directory
+with D4.MemoryBackend() as mem, D4.config(root = os.path.join(mydir, "memory"), storage = mem):
+    memtask = D4.Task("DiseaseABC", "myStudy", "inMemory")
+    memtask.saveBinary(d, "myTables")
+    assert D4.loadTask("DiseaseABC", "myStudy", "inMemory").readBinary("myTables")["other"].equals(d["other"])
+assert not os.path.exists(os.path.join(mydir, "memory", "myClient"))
+cachedir = os.path.join(mydir, "cache")
+remotedir = os.path.join(mydir, "remote")
+with D4.CachedBackend(cachedir, remotedir, maxBytes = 1) as cached, D4.config(root = cachedir, storage = cached):
+    cachedtask = D4.Task("DiseaseABC", "myStudy", "cachedAnalysis")
+    cachedtask.saveBinary(d, "myTables")
+    cached.flush()
+    assert os.path.exists(os.path.join(remotedir, os.path.relpath(cachedtask.binaryFn("myTables", "pkl"), cachedir)))
+    # the files written back are evicted by the next write, but are not missing
+    cachedtask.saveBinary(d["other"], "other")
+    assert not os.path.exists(cachedtask.binaryFn("myTables", "pkl"))
+    assert (D4.verifyTask(cachedtask, update = True)["status"] != "missing").all()
+    assert (D4.verifyTask(cachedtask, full = True)["status"] == "ok").all()
+    assert cachedtask.readBinary("myTables")["other"].equals(d["other"])
+
+# 11. Import without the heavy dependencies
+import subprocess, sys
+heavy = subprocess.run([sys.executable, "-c", 
+                        "import sys, d4talink; print(sorted(m for m in "
+                        "('pandas', 'xlsxwriter', 'openpyxl', 'pyarrow', 'zstandard', 'lz4') "
+                        "if m in sys.modules))"], 
+                       capture_output = True, text = True, check = True).stdout.strip()
+assert heavy == "[]", heavy
+
 # 99. Clean up
 if os.path.exists(mydir):
     shutil.rmtree(mydir)